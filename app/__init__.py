@@ -1 +1,7 @@
-from .agent import root_agent
\ No newline at end of file
+def __getattr__(name):
+    # Resolved on first access so importing app.tools (as every tool worker
+    # does) doesn't build the agents or import ADK and langchain
+    if name == "root_agent":
+        from .agent import root_agent
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,167 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS, ADMISSION_WAIT
+
+# Limits are per process; with several uvicorn workers each one enforces its own
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# A request that can't start within this long is turned away rather than left to time out upstream
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+# Per-user token bucket: sustained requests per minute and burst size
+USER_RATE_PER_MINUTE = float(os.getenv("USER_RATE_PER_MINUTE", "30"))
+USER_BURST = float(os.getenv("USER_BURST", "10"))
+USER_BUCKETS_MAX = 10000
+
+# Weight of the newest request in the moving average of slot hold time
+HOLD_TIME_ALPHA = 0.1
+
+
+class AdmissionRejected(Exception):
+    """A request turned away by admission control; status is 429 or 503"""
+
+    def __init__(self, status: int, reason: str, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class TokenBucket:
+    """Per-key token buckets, refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = USER_BUCKETS_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """Spend a token for key; returns 0, or the seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        # Least recently seen buckets have refilled anyway, so dropping them forgets nothing
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Global concurrency cap with a bounded, deadline-limited wait queue and per-user rate limits
+
+    Requests beyond the cap wait in FIFO order; when the queue is full, or a
+    request can't start before its deadline, it gets a fast 503 instead of
+    adding to everyone's latency. Users over their rate get a 429.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                 rate_per_minute: float = USER_RATE_PER_MINUTE, burst: float = USER_BURST):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.buckets = TokenBucket(rate_per_minute / 60, burst)
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.hold_seconds = None
+        self.stats = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def retry_after(self) -> float:
+        # Time for the queue ahead to drain at the current service rate
+        hold = self.hold_seconds or 1.0
+        return hold * (self.waiting + 1) / self.max_concurrent
+
+    def reject(self, status: int, reason: str, retry_after: float, detail: str):
+        self.stats[reason] += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        raise AdmissionRejected(status, reason, retry_after, detail)
+
+    def limit_rate(self, user_id: str):
+        """Spend one of user_id's tokens, or raise AdmissionRejected (429)"""
+        wait = self.buckets.take(user_id)
+        if wait > 0:
+            self.reject(429, "rate_limited", wait, "Too many requests; please slow down")
+
+    async def acquire(self, user_id: Optional[str]) -> float:
+        """Wait for a slot, or raise AdmissionRejected; pass the result to release()
+
+        user_id=None takes a slot without spending a token, for work whose
+        request was already rate-limited (the items of a batch).
+        """
+        if user_id is not None:
+            self.limit_rate(user_id)
+
+        if not self._slots.locked():
+            # A free slot is taken without suspending, so a burst can't all see it free
+            await self._slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.reject(503, "queue_full", self.retry_after(), "Server is busy; please retry shortly")
+            self.stats["queued"] += 1
+            self.waiting += 1
+            ADMISSION_QUEUE_DEPTH.inc()
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.reject(503, "queue_timeout", self.retry_after(), "Server is busy; please retry shortly")
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.dec()
+                ADMISSION_WAIT.observe(time.perf_counter() - start)
+
+        return self._admitted()
+
+    async def try_acquire(self) -> Optional[float]:
+        """Take a slot only if one is free right now, without a token; None when busy"""
+        if self._slots.locked():
+            return None
+        await self._slots.acquire()
+        return self._admitted()
+
+    def _admitted(self) -> float:
+        self.active += 1
+        self.stats["admitted"] += 1
+        ADMISSION_ACTIVE.inc()
+        return time.perf_counter()
+
+    def release(self, held_from: float):
+        held = time.perf_counter() - held_from
+        self.hold_seconds = held if self.hold_seconds is None else (
+            (1 - HOLD_TIME_ALPHA) * self.hold_seconds + HOLD_TIME_ALPHA * held)
+        self.active -= 1
+        ADMISSION_ACTIVE.dec()
+        self._slots.release()
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "enabled": ADMISSION_ENABLED,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "avg_hold_seconds": self.hold_seconds,
+            "tracked_users": len(self.buckets),
+        }
+
+
+admission = AdmissionController()
@@ -4,8 +4,7 @@ import logging
 logging.basicConfig(level=logging.ERROR)
 
 from google.adk.agents import Agent
-from google.adk.tools import load_memory
-from google.adk.tools.langchain_tool import LangchainTool
+from google.adk.tools import FunctionTool, load_memory
 import os
 
 from dotenv import load_dotenv
@@ -14,38 +13,48 @@ from dotenv import load_dotenv
 import sys
 sys.path.append(os.path.dirname(__file__))
 
-from .tools.math_tools import calculate_expression, solve_equation, create_graph
+from .tools.math_tools import calculate_expression, calculate_expression_fast, solve_equation, create_graph, evaluate_batch
 from .tools.physics_tools import get_physics_constant, convert_units, calculate_physics
 from .tools.biology_tools import get_biology_info, classify_organism, calculate_genetics, get_dna_complement
 from .tools.chemistry_tools import get_element_info, calculate_molar_mass, balance_equation, calculate_molarity, get_chemistry_constant, calculate_ph
-from langchain_community.tools import TavilySearchResults
+from .tools.executor import run_in_tool_pool
+from .tools.instrumentation import instrument_tool
+from .tools.web_search import tavily_search_results_json
+from .model_tiers import model_for
 
 load_dotenv()
 
 # Global settings
-AGENT_MODEL = "gemini-2.0-flash"
+# Each agent's model (and fallback) comes from AGENT_MODEL / AGENT_MODELS and friends; see model_tiers
 APP_NAME = "ai_tutor_app"
 USER_ID = "user_1"
 
+# sympy tools run in worker processes with a hard timeout so a pathological
+# input can't stall the event loop serving every request (create_graph
+# already renders in the pool itself)
+pooled_calculate_expression = run_in_tool_pool(calculate_expression, fast_path=calculate_expression_fast)
+pooled_solve_equation = run_in_tool_pool(solve_equation)
+pooled_evaluate_batch = run_in_tool_pool(evaluate_batch)
 
-tavily_search = TavilySearchResults(
-        max_results=5,
-        search_depth="advanced",
-        include_answer=True,
-        include_raw_content=True,
-        include_images=False,
-)
-    
-adk_tavily_tool = LangchainTool(tool=tavily_search)
+
+def tutor_tools(*funcs) -> list:
+    """Tool list for an agent, with every call instrumented (metrics, timing records, profiling)"""
+    return [instrument_tool(func) for func in funcs] + [load_memory]
+
+
+# Same tool name and schema the LangchainTool wrapper exposed; results are
+# cached per normalized query and concurrent identical searches share one call
+adk_tavily_tool = FunctionTool(instrument_tool(tavily_search_results_json))
     
 web_search_agent = Agent(
-        model=AGENT_MODEL,
+        model=model_for("web_search_agent"),
         name="web_search_agent",
         instruction="""You are the Web Search Agent. Your ONLY task is to search the internet for current information and provide accurate, up-to-date answers.
 
 Rules:
 - Use the Tavily search tool to find current information on the internet
 - Always provide sources and citations when possible
+- Search results are numbered sources, each with a url, title and the relevant passages; cite the url of every source you use
 - Focus on recent and reliable information
 - Summarize findings clearly and concisely
 - Do not make up information - only use what you find through search
@@ -66,7 +75,7 @@ Examples:
 
 # Math specialist agent
 math_agent = Agent(
-    model=AGENT_MODEL,
+    model=model_for("math_agent"),
     name="math_agent",
     instruction="""You are the Math Tutor Agent. Your ONLY task is to provide correct answers to mathematics problems.
 
@@ -74,22 +83,25 @@ Rules:
 - Use calculate_expression tool for mathematical calculations
 - Use solve_equation tool for solving equations  
 - Use create_graph tool for graphing functions when requested
+- Use evaluate_batch tool to evaluate expressions over many values at once (tables, worksheets, answer keys)
 - Always show step-by-step solutions when possible
 - For graphing requests, ALWAYS use the create_graph tool
+- create_graph returns a markdown image link (![Graph](/graphs/...)); include it unchanged in your answer
 - Do not perform any other actions outside of mathematics
 
 Examples:
 - "Calculate 2x + 5" → use calculate_expression
 - "Solve 2x + 5 = 11" → use solve_equation  
-- "Graph f(x) = x^2" → use create_graph""",
+- "Graph f(x) = x^2" → use create_graph
+- "Make a table of x^2 + 1 for x = 1..10" → use evaluate_batch with variable_names ["x"] and values [[1, 2, ..., 10]]""",
     
     description="Handles mathematics questions including calculations, equation solving, and graphing",
-    tools=[calculate_expression, solve_equation, create_graph, load_memory]
+    tools=tutor_tools(pooled_calculate_expression, pooled_solve_equation, create_graph, pooled_evaluate_batch)
 )
 
 # Physics specialist agent
 physics_agent = Agent(
-    model=AGENT_MODEL, 
+    model=model_for("physics_agent"), 
     name="physics_agent",
     instruction="""You are the Physics Tutor Agent. Your ONLY task is to provide correct answers to physics problems.
 
@@ -108,12 +120,12 @@ Examples:
 - "Calculate force with mass 10kg and acceleration 5m/s²" → use calculate_physics""",
     
     description="Handles physics questions including constants, unit conversions, and physics calculations",
-    tools=[get_physics_constant, convert_units, calculate_physics, calculate_expression, load_memory]
+    tools=tutor_tools(get_physics_constant, convert_units, calculate_physics, pooled_calculate_expression)
 )
 
 # Biology specialist agent
 biology_agent = Agent(
-    model=AGENT_MODEL,
+    model=model_for("biology_agent"),
     name="biology_agent",
     instruction="""You are the Biology Tutor Agent. Your ONLY task is to provide correct answers to biology problems.
 
@@ -133,12 +145,12 @@ Examples:
 - "Find complement of ATCG" → use get_dna_complement""",
     
     description="Handles biology questions including cell biology, genetics, organism classification, and molecular biology",
-    tools=[get_biology_info, classify_organism, calculate_genetics, get_dna_complement, load_memory]
+    tools=tutor_tools(get_biology_info, classify_organism, calculate_genetics, get_dna_complement)
 )
 
 # Chemistry specialist agent
 chemistry_agent = Agent(
-    model=AGENT_MODEL,
+    model=model_for("chemistry_agent"),
     name="chemistry_agent", 
     instruction="""You are the Chemistry Tutor Agent. Your ONLY task is to provide correct answers to chemistry problems.
 
@@ -161,7 +173,7 @@ Examples:
 - "Calculate pH with [H+] = 0.01" → use calculate_ph""",
     
     description="Handles chemistry questions including elements, compounds, reactions, and calculations",
-    tools=[get_element_info, calculate_molar_mass, balance_equation, calculate_molarity, get_chemistry_constant, calculate_ph, load_memory]
+    tools=tutor_tools(get_element_info, calculate_molar_mass, balance_equation, calculate_molarity, get_chemistry_constant, calculate_ph)
 )
 
 
@@ -177,7 +189,7 @@ web_search_instruction = """
 
 root_agent = Agent(
     name="ai_tutor_orchestrator",
-    model=AGENT_MODEL,
+    model=model_for("ai_tutor_orchestrator"),
     description="AI Tutor that coordinates learning activities and delegates to subject specialists",
     instruction=f"""You are the AI Tutor Orchestrator. Your main task is to analyze user queries and delegate them to the appropriate specialist agent.
 
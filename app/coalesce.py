@@ -0,0 +1,44 @@
+import asyncio
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers asking for the same key
+
+    The first caller for a key starts func() as its own task and later callers
+    await that task, so the work runs once however many requests arrive while
+    it is in flight. Nothing is kept after it finishes; that's what caches are
+    for. A caller that is cancelled (client went away) doesn't cancel the
+    shared call for the others.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    async def run(self, key, func) -> tuple:
+        """(result, shared): shared is True when another caller's call was joined"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task), True
+
+        self.stats["leaders"] += 1
+        task = asyncio.ensure_future(func())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), False
+
+    def _finished(self, key, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller has gone away
+            task.exception()
+
+    def get_stats(self) -> dict:
+        calls = self.stats["leaders"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "in_flight": len(self._inflight),
+            "coalesced_rate": self.stats["coalesced"] / calls if calls else 0.0,
+        }
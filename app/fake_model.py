@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import inspect
+import os
+import random
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+# Simulated model latency per call: mean and uniform jitter, in milliseconds
+FAKE_MODEL_LATENCY_MS = float(os.getenv("FAKE_MODEL_LATENCY_MS", "300"))
+FAKE_MODEL_JITTER_MS = float(os.getenv("FAKE_MODEL_JITTER_MS", "100"))
+# Fraction of calls that fail, to exercise error handling under load
+FAKE_MODEL_ERROR_RATE = float(os.getenv("FAKE_MODEL_ERROR_RATE", "0"))
+FAKE_MODEL_STREAM_CHUNKS = 4
+
+TRANSFER_TOOL = "transfer_to_agent"
+# ADK replays other agents' turns to the current agent as user messages with this prefix
+CONTEXT_PREFIX = "For context:"
+
+
+class FakeModelError(Exception):
+    """Injected failure from the fake model"""
+
+
+def is_context_content(content: types.Content) -> bool:
+    # The prefix may share a part with the replayed text or, in newer ADK versions, be a part of its own
+    parts = content.parts or []
+    return bool(parts and parts[0].text and parts[0].text.startswith(CONTEXT_PREFIX))
+
+
+def latest_query(llm_request: LlmRequest) -> str:
+    """Text of the last real user turn, skipping other agents' turns replayed as context"""
+    for content in reversed(llm_request.contents or []):
+        if content.role != "user" or is_context_content(content):
+            continue
+        for part in content.parts or []:
+            if part.text:
+                return part.text
+    return ""
+
+
+def pending_function_response(llm_request: LlmRequest):
+    """The function response the model is being asked to continue from, if any"""
+    contents = llm_request.contents or []
+    if not contents:
+        return None
+    for part in contents[-1].parts or []:
+        if part.function_response:
+            return part.function_response
+    return None
+
+
+def tool_call_args(tool, args: tuple) -> dict:
+    # Router plans carry positional args; function calls need them by name
+    names = list(inspect.signature(tool.func).parameters)
+    return dict(zip(names, args))
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic offline stand-in for Gemini, for load tests
+
+    Plays the script a real model usually follows: the orchestrator transfers
+    to the specialist the keyword classifier picks, the specialist calls the
+    tool the fast-path router would call, then answers with the tool result.
+    Latency and failures are simulated; nothing leaves the process, and the
+    same request always gets the same reply.
+    """
+
+    model: str = "fake-tutor-model"
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"fake-.*"]
+
+    def plan(self, llm_request: LlmRequest) -> types.Content:
+        from .router import classify_query, match_fast_path
+
+        tools = llm_request.tools_dict or {}
+        query = latest_query(llm_request)
+        response = pending_function_response(llm_request)
+
+        if response is not None and response.name != TRANSFER_TOOL:
+            result = (response.response or {}).get("result", response.response)
+            return self.text(f"Here is what I found using {response.name}:\n\n{result}")
+
+        # Only the orchestrator has transfer_to_agent without any domain tools of its own
+        domain_tools = [name for name in tools if name not in (TRANSFER_TOOL, "load_memory")]
+        if TRANSFER_TOOL in tools and not domain_tools and response is None:
+            target = classify_query(query) or "math_agent"
+            return self.call(TRANSFER_TOOL, {"agent_name": target})
+
+        for _, tool, args in match_fast_path(query):
+            if tool.__name__ in tools:
+                return self.call(tool.__name__, tool_call_args(tools[tool.__name__], args))
+
+        return self.text(f"(fake model) A tutor would now explain: {query}")
+
+    @staticmethod
+    def text(text: str) -> types.Content:
+        return types.Content(role="model", parts=[types.Part(text=text)])
+
+    @staticmethod
+    def call(name: str, args: dict) -> types.Content:
+        return types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))])
+
+    def rng(self, llm_request: LlmRequest) -> random.Random:
+        # Seeded from the conversation so runs are repeatable
+        digest = hashlib.sha256(repr(llm_request.contents).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        rng = self.rng(llm_request)
+        latency = max(0.0, FAKE_MODEL_LATENCY_MS + rng.uniform(-FAKE_MODEL_JITTER_MS, FAKE_MODEL_JITTER_MS))
+        if rng.random() < FAKE_MODEL_ERROR_RATE:
+            await asyncio.sleep(latency / 1000)
+            raise FakeModelError("injected fake model failure")
+
+        content = self.plan(llm_request)
+        text = content.parts[0].text
+        if not (stream and text):
+            await asyncio.sleep(latency / 1000)
+            yield LlmResponse(content=content)
+            return
+
+        # Spread the latency over partial chunks like a streaming model
+        size = max(1, len(text) // FAKE_MODEL_STREAM_CHUNKS + 1)
+        for start in range(0, len(text), size):
+            await asyncio.sleep(latency / 1000 / FAKE_MODEL_STREAM_CHUNKS)
+            yield LlmResponse(content=self.text(text[start:start + size]), partial=True)
+        yield LlmResponse(content=content, partial=False)
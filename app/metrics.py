@@ -0,0 +1,96 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+# With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all of them
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Agent turns run for seconds; tools range from microseconds (lookups) to seconds (sympy, graphs)
+REQUEST_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOOL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "tutor_http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge(
+    "tutor_http_requests_in_flight", "HTTP requests currently being handled",
+    ["route"], multiprocess_mode="livesum")
+AGENT_HOP_DURATION = Histogram(
+    "tutor_agent_hop_duration_seconds", "Time an agent held the turn before handing off or answering",
+    ["agent"], buckets=REQUEST_BUCKETS)
+AGENT_TURNS = Counter(
+    "tutor_agent_turns_total", "Agent turns by the agent that produced the final answer",
+    ["agent"])
+AGENT_RUNS_IN_FLIGHT = Gauge(
+    "tutor_agent_runs_in_flight", "ADK runner invocations currently in progress",
+    multiprocess_mode="livesum")
+MODEL_CALLS = Counter(
+    "tutor_model_calls_total", "Model calls by agent, model actually used and outcome", ["agent", "model", "outcome"])
+MODEL_FALLBACKS = Counter(
+    "tutor_model_fallbacks_total", "Model calls diverted from an agent's primary model", ["agent", "reason"])
+MODEL_LATENCY = Histogram(
+    "tutor_model_first_response_seconds", "Time from model call to its first response", ["model"],
+    buckets=REQUEST_BUCKETS)
+QUERY_COALESCING = Counter(
+    "tutor_query_coalescing_total", "Agent-run queries that led an execution or joined one already in flight",
+    ["role"])
+ADMISSION_ACTIVE = Gauge(
+    "tutor_admission_active", "Query requests holding an admission slot", multiprocess_mode="livesum")
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "tutor_admission_queue_depth", "Query requests waiting for an admission slot", multiprocess_mode="livesum")
+ADMISSION_WAIT = Histogram(
+    "tutor_admission_wait_seconds", "Time queued query requests waited for an admission slot", buckets=REQUEST_BUCKETS)
+ADMISSION_REJECTIONS = Counter(
+    "tutor_admission_rejections_total", "Query requests turned away by admission control", ["reason"])
+TOOL_CALLS = Counter("tutor_tool_calls_total", "Tool calls", ["tool"])
+TOOL_ERRORS = Counter("tutor_tool_errors_total", "Tool calls that raised or returned an error message", ["tool"])
+TOOL_LATENCY = Histogram("tutor_tool_duration_seconds", "Tool call latency", ["tool"], buckets=TOOL_BUCKETS)
+
+
+def record_tool_call(tool: str, seconds: float, error: bool):
+    TOOL_CALLS.labels(tool).inc()
+    TOOL_LATENCY.labels(tool).observe(seconds)
+    if error:
+        TOOL_ERRORS.labels(tool).inc()
+
+
+class AgentHopTimer:
+    """Attribute wall time in an ADK event stream to the agent that authored each stretch
+
+    A hop runs until the next agent's first event (a transfer) or the end of
+    the run; the first hop also covers the wait for the first event. Call
+    finish() exactly once, even when the run fails.
+    """
+
+    def __init__(self):
+        self.agent = None
+        self.started = time.perf_counter()
+        AGENT_RUNS_IN_FLIGHT.inc()
+
+    def observe(self, author: str):
+        if not author or author == "user" or author == self.agent:
+            return
+        now = time.perf_counter()
+        if self.agent is not None:
+            AGENT_HOP_DURATION.labels(self.agent).observe(now - self.started)
+            self.started = now
+        self.agent = author
+
+    def finish(self, final_agent: str = None):
+        if self.agent is not None:
+            AGENT_HOP_DURATION.labels(self.agent).observe(time.perf_counter() - self.started)
+        AGENT_RUNS_IN_FLIGHT.dec()
+        if final_agent:
+            AGENT_TURNS.labels(final_agent).inc()
+
+
+def render_metrics() -> tuple:
+    """(body, content_type) in the Prometheus text format"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,198 @@
+import logging
+import os
+import time
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse, LLMRegistry
+
+from .metrics import MODEL_CALLS, MODEL_FALLBACKS, MODEL_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Model for agents without their own entry in AGENT_MODELS
+AGENT_MODEL = os.getenv("AGENT_MODEL", "gemini-2.0-flash")
+# Per-agent overrides, "agent=model,agent=model", e.g. a lighter model for routing:
+# AGENT_MODELS="ai_tutor_orchestrator=gemini-2.0-flash-lite,chemistry_agent=gemini-2.0-flash-lite"
+AGENT_MODELS = os.getenv("AGENT_MODELS", "")
+# Model an agent switches to while its own is slow or failing, with per-agent overrides; off unless set
+AGENT_FALLBACK_MODEL = os.getenv("AGENT_FALLBACK_MODEL", "")
+AGENT_FALLBACK_MODELS = os.getenv("AGENT_FALLBACK_MODELS", "")
+
+# A model is degraded when its average time to first response or its error rate passes these
+MODEL_FALLBACK_LATENCY_SECONDS = float(os.getenv("MODEL_FALLBACK_LATENCY_SECONDS", "8"))
+MODEL_FALLBACK_ERROR_RATE = float(os.getenv("MODEL_FALLBACK_ERROR_RATE", "0.3"))
+# Calls observed before a model can be judged, and how long a degraded model is skipped
+MODEL_FALLBACK_MIN_SAMPLES = int(os.getenv("MODEL_FALLBACK_MIN_SAMPLES", "5"))
+MODEL_FALLBACK_COOLDOWN_SECONDS = float(os.getenv("MODEL_FALLBACK_COOLDOWN_SECONDS", "60"))
+# Weight of the newest call in the moving averages
+MODEL_HEALTH_ALPHA = 0.2
+
+FAKE_MODEL = os.getenv("FAKE_MODEL", "false").lower() == "true"
+
+
+def parse_agent_models(spec: str) -> dict:
+    """{"agent": "model"} from "agent=model,agent=model" """
+    models = {}
+    for item in spec.split(","):
+        agent, _, model = item.partition("=")
+        if agent.strip() and model.strip():
+            models[agent.strip()] = model.strip()
+    return models
+
+
+class ModelHealth:
+    """Moving averages of one model's latency and error rate, with a circuit breaker
+
+    Once degraded, the model is skipped for the cooldown; then a single call
+    probes it, and a fast success puts it back in service.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def available(self) -> bool:
+        if not self.open_until:
+            return True
+        if time.monotonic() < self.open_until or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record(self, seconds: float, error: bool):
+        if self.probing:
+            self.probing = False
+            if error or seconds > MODEL_FALLBACK_LATENCY_SECONDS:
+                self.trip("probe failed")
+            else:
+                logger.info(f"Model {self.model} recovered; back in service")
+                self.latency, self.error_rate, self.samples, self.open_until = seconds, 0.0, 1, 0.0
+            return
+
+        self.samples += 1
+        self.latency = seconds if self.latency is None else (
+            (1 - MODEL_HEALTH_ALPHA) * self.latency + MODEL_HEALTH_ALPHA * seconds)
+        self.error_rate = (1 - MODEL_HEALTH_ALPHA) * self.error_rate + MODEL_HEALTH_ALPHA * error
+        if self.samples >= MODEL_FALLBACK_MIN_SAMPLES and not self.open_until:
+            if self.latency > MODEL_FALLBACK_LATENCY_SECONDS:
+                self.trip(f"latency {self.latency:.1f}s")
+            elif self.error_rate > MODEL_FALLBACK_ERROR_RATE:
+                self.trip(f"error rate {self.error_rate:.0%}")
+
+    def abandon_probe(self):
+        """A probe that ended before its first response (cancelled) says nothing; the next call probes"""
+        self.probing = False
+
+    def trip(self, reason: str):
+        self.open_until = time.monotonic() + MODEL_FALLBACK_COOLDOWN_SECONDS
+        self.trips += 1
+        logger.warning(f"Model {self.model} degraded ({reason}); using fallbacks for "
+                       f"{MODEL_FALLBACK_COOLDOWN_SECONDS:g}s")
+
+    def get_stats(self) -> dict:
+        return {
+            "latency_avg_seconds": self.latency,
+            "error_rate": self.error_rate,
+            "samples": self.samples,
+            "degraded": bool(self.open_until),
+            "trips": self.trips,
+        }
+
+
+# Health is per model, not per agent: a slow endpoint is slow for every agent using it
+MODEL_HEALTH = {}
+
+
+def model_health(model: str) -> ModelHealth:
+    if model not in MODEL_HEALTH:
+        MODEL_HEALTH[model] = ModelHealth(model)
+    return MODEL_HEALTH[model]
+
+
+class FallbackLlm(BaseLlm):
+    """An agent's model with a fallback for while it's degraded
+
+    Calls go to the primary model unless its health says otherwise. A call
+    that fails before producing anything is retried once on the other model,
+    so a failing endpoint costs a retry rather than an error for the student.
+    """
+
+    agent: str
+    primary: BaseLlm
+    fallback: BaseLlm
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        primary_health = model_health(self.primary.model)
+        if primary_health.available():
+            order = [self.primary, self.fallback]
+            # available() hands the probe of a degraded model to exactly one call
+            probe = primary_health.probing
+        else:
+            MODEL_FALLBACKS.labels(self.agent, "degraded").inc()
+            order = [self.fallback, self.primary]
+            probe = False
+
+        try:
+            for attempt, llm in enumerate(order):
+                health = model_health(llm.model)
+                # ADK fills in the agent's model name; the delegate must call its own
+                llm_request.model = llm.model
+                start = time.perf_counter()
+                produced = False
+                try:
+                    async for response in llm.generate_content_async(llm_request, stream=stream):
+                        if not produced:
+                            produced = True
+                            # Time to first response is what a student waits on
+                            seconds = time.perf_counter() - start
+                            health.record(seconds, bool(response.error_code))
+                            MODEL_LATENCY.labels(llm.model).observe(seconds)
+                            MODEL_CALLS.labels(self.agent, llm.model, "error" if response.error_code else "ok").inc()
+                        yield response
+                    return
+                except Exception as e:
+                    if produced:
+                        raise
+                    health.record(time.perf_counter() - start, True)
+                    MODEL_CALLS.labels(self.agent, llm.model, "error").inc()
+                    if attempt == len(order) - 1:
+                        raise
+                    logger.warning(f"{self.agent}: {llm.model} failed ({e}); retrying on {order[attempt + 1].model}")
+                    MODEL_FALLBACKS.labels(self.agent, "error").inc()
+        finally:
+            # record() settles a probe; one cancelled before its first response must not stay pending
+            if probe and primary_health.probing:
+                primary_health.abandon_probe()
+
+
+def resolve_model(model: str) -> BaseLlm:
+    if FAKE_MODEL:
+        # FAKE_MODEL=true swaps Gemini for a scripted offline model so the stack can be load-tested
+        from .fake_model import FakeLlm
+        return FakeLlm(model=model)
+    return LLMRegistry.new_llm(model)
+
+
+def model_for(agent: str):
+    """Model setting for an agent: a model name, or a FallbackLlm when a distinct fallback is configured"""
+    primary = parse_agent_models(AGENT_MODELS).get(agent, AGENT_MODEL)
+    fallback = parse_agent_models(AGENT_FALLBACK_MODELS).get(agent, AGENT_FALLBACK_MODEL)
+    if not fallback or fallback == primary:
+        return resolve_model(primary) if FAKE_MODEL else primary
+    return FallbackLlm(model=primary, agent=agent, primary=resolve_model(primary), fallback=resolve_model(fallback))
+
+
+def get_model_stats() -> dict:
+    return {
+        "default_model": AGENT_MODEL,
+        "agent_models": parse_agent_models(AGENT_MODELS),
+        "default_fallback_model": AGENT_FALLBACK_MODEL or None,
+        "agent_fallback_models": parse_agent_models(AGENT_FALLBACK_MODELS),
+        "health": {model: health.get_stats() for model, health in MODEL_HEALTH.items()},
+    }
@@ -0,0 +1,96 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Answers from these agents depend on live data and are never cached
+UNCACHEABLE_AGENTS = {"web_search_agent"}
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different phrasings share a cache entry"""
+    query = " ".join(query.lower().split())
+    return re.sub(r"[\s?!.]+$", "", query)
+
+
+class ResponseCache:
+    """In-process LRU cache of agent responses with TTL and entry/byte bounds"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 8 * 1024 * 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0, "skipped": 0}
+
+    @staticmethod
+    def make_key(query: str, agent: str) -> tuple:
+        return (normalize_query(query), agent)
+
+    def get(self, query: str, agent: str) -> Optional[str]:
+        """Return the cached response, or None on miss/expiry"""
+        key = self.make_key(query, agent)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+
+        response, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return response
+
+    def put(self, query: str, agent: str, response: str):
+        """Store a response, evicting least recently used entries to stay in bounds"""
+        size = len(response.encode("utf-8"))
+        if agent in UNCACHEABLE_AGENTS or size > self.max_bytes:
+            self.stats["skipped"] += 1
+            return
+
+        key = self.make_key(query, agent)
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (response, size, time.monotonic() + self.ttl_seconds)
+        self._bytes += size
+        self.stats["stores"] += 1
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evicted"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: tuple):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+)
@@ -0,0 +1,336 @@
+import inspect
+import re
+import time
+
+from .tools.math_tools import calculate_expression, calculate_expression_fast, solve_equation, create_graph
+from .tools.executor import run_in_tool_pool
+from .metrics import record_tool_call
+from .tools.instrumentation import is_error_result
+from .tools.physics_tools import get_physics_constant, convert_units, PHYSICS_CONSTANTS
+from .tools.biology_tools import get_dna_complement
+from .tools.chemistry_tools import get_element_info, calculate_molar_mass, calculate_ph, PERIODIC_TABLE
+
+# Unit aliases accepted in "Convert 5 meters to feet" style queries
+UNIT_ALIASES = {
+    "m": "m", "meter": "m", "meters": "m", "metre": "m", "metres": "m",
+    "ft": "ft", "foot": "ft", "feet": "ft",
+    "in": "in", "inch": "in", "inches": "in",
+    "km": "km", "kilometer": "km", "kilometers": "km", "kilometre": "km", "kilometres": "km",
+    "mi": "mi", "mile": "mi", "miles": "mi",
+    "kg": "kg", "kilogram": "kg", "kilograms": "kg",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "g": "g", "gram": "g", "grams": "g",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "c": "c", "celsius": "c", "°c": "c",
+    "f": "f", "fahrenheit": "f", "°f": "f",
+    "k": "k", "kelvin": "k",
+}
+
+# Keyword indexes built from the tool data tables
+CONSTANT_INDEX = {name.replace("_", " "): name for name in PHYSICS_CONSTANTS}
+CONSTANT_INDEX.update({
+    "speed of light in vacuum": "speed_of_light",
+    "gravitational constant g": "gravitational_constant",
+    "planck's constant": "planck_constant",
+    "charge of an electron": "electron_charge",
+    "elementary charge": "electron_charge",
+    "avogadro's number": "avogadro_number",
+    "avogadro constant": "avogadro_number",
+    "boltzmann's constant": "boltzmann_constant",
+    "ideal gas constant": "gas_constant",
+})
+ELEMENT_INDEX = {elem["name"].lower(): key for key, elem in PERIODIC_TABLE.items()}
+
+# Only digits, operators, brackets and whitespace count as plain arithmetic
+ARITHMETIC = r"[\d\s\.\+\-\*/\^\(\)%]+"
+# Equations in x only, e.g. "2x + 5 = 11"
+EQUATION = r"[\dx\s\.\+\-\*/\^\(\)]+=[\dx\s\.\+\-\*/\^\(\)]+"
+FUNCTION = r"[\dx\s\.\+\-\*/\^\(\)]+|(?:sin|cos|tan|exp|log|sqrt)\([\dx\s\.\+\-\*/\^]+\)"
+
+QUESTION_PREFIX = r"(?:what\s+is|what's|whats|tell\s+me|give\s+me|find|get)?\s*(?:the\s+)?(?:value\s+of\s+(?:the\s+)?)?"
+
+# Delegation keywords from the orchestrator rules in app/agent.py
+SPECIALIST_KEYWORDS = {
+    "web_search_agent": ["current", "latest", "news", "stock", "weather", "recent", "today", "price", "2024", "2025", "2026"],
+    "math_agent": ["algebra", "calculus", "equation", "graph", "plot", "function", "derivative", "integral",
+                   "geometry", "statistics", "solve", "polynomial", "factor", "simplify"],
+    "physics_agent": ["mechanics", "force", "energy", "velocity", "acceleration", "speed of light", "newton",
+                      "gravity", "gravitational", "thermodynamics", "electromagnetism", "momentum", "convert"],
+    "biology_agent": ["cell", "cells", "genetics", "gene", "genes", "organism", "dna", "rna", "evolution", "ecology",
+                      "mitochondria", "hardy-weinberg", "allele", "photosynthesis", "organelle", "organelles"],
+    "chemistry_agent": ["element", "elements", "compound", "reaction", "molar", "molarity", "ph", "periodic table",
+                        "atomic", "molecule", "acid", "base"],
+}
+SPECIALIST_PATTERNS = {
+    agent: re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")\b", re.IGNORECASE)
+    for agent, words in SPECIALIST_KEYWORDS.items()
+}
+
+# Clause boundaries in multi-part questions: sentence ends, semicolons, and "and"/"also" joins
+CLAUSE_SEPARATOR = re.compile(
+    r"\?+\s*|;+\s*|\.\s+(?=[A-Za-z])|,?\s+\b(?:and also|and then|and|also|plus)\b\s+"
+    r"|,\s+(?=(?:what|how|why|which|who|find|calculate|compute|convert|solve)\b)",
+    re.IGNORECASE)
+# A clause asked in its own right opens with a question word or an instruction
+QUESTION_START = re.compile(
+    r"\s*(?:what|what's|whats|how|why|which|who|when|where|is|are|does|do|can|could|explain|describe|define|"
+    r"find|calculate|compute|convert|solve|graph|plot|name|list|give|tell)\b",
+    re.IGNORECASE)
+# "the reaction involved", "why the reaction needs enzymes": a definite reference to the clause before
+DEFINITE_REFERENCE = re.compile(
+    r"\b(?:involved|mentioned|described|same|former|latter)\b"
+    r"|\bthe\s+(?:\w+\s+)?(?:reaction|process|compound|molecule|element|equation|function|enzyme|cell|organism|"
+    r"object|one)s?\b(?!\s+(?:of|for|in|at|between|from|with)\b)",
+    re.IGNORECASE)
+# Words pointing back at earlier text ("convert it", "simplify that", "do those again")
+FOLLOW_UP_REFERENCE = re.compile(
+    r"\b(?:it|its|itself|they|them|their|this|that|these|those|the result|the answer|above|previous|again)\b",
+    re.IGNORECASE)
+
+# sympy tools run in the worker pool so they can't stall the event loop
+# (create_graph is async and renders in the pool itself)
+POOLED_TOOLS = {
+    calculate_expression: run_in_tool_pool(calculate_expression, fast_path=calculate_expression_fast),
+    solve_equation: run_in_tool_pool(solve_equation),
+}
+
+# Tool error messages mean the query was not really tool-shaped; fall through
+ERROR_MARKERS = ("error", "not found", "not supported", "not recognized", "unknown element", "please provide")
+
+ROUTER_STATS = {
+    "queries": 0,
+    "hits": 0,
+    "misses": 0,
+    "hits_by_tool": {},
+    "fast_path_seconds": 0.0,
+    "latency_saved_seconds": 0.0,
+    "agent_latency_avg_seconds": None,
+}
+
+# Weight of the newest sample in the moving average of full agent latency
+AGENT_LATENCY_ALPHA = 0.1
+
+
+def insert_implicit_multiplication(expression: str) -> str:
+    """Turn '2x' and '3(x+1)' into '2*x' and '3*(x+1)' for sympy"""
+    expression = re.sub(r"(\d)\s*([x\(])", r"\1*\2", expression)
+    return re.sub(r"\)\s*([\dx\(])", r")*\1", expression)
+
+
+def route_calculate(match):
+    expression = match.group("expr").strip().replace("^", "**")
+    if not re.search(r"\d", expression):
+        return None
+    return "math_agent", calculate_expression, (expression,)
+
+
+def route_solve(match):
+    equation = insert_implicit_multiplication(match.group("eq").replace("^", "**"))
+    if "x" not in equation:
+        return None
+    return "math_agent", solve_equation, (equation,)
+
+
+def route_graph(match):
+    function = insert_implicit_multiplication(match.group("func").strip().replace("^", "**"))
+    return "math_agent", create_graph, (function,)
+
+
+def route_constant(match):
+    name = match.group("name").strip().lower()
+    constant = CONSTANT_INDEX.get(name)
+    if not constant:
+        return None
+    return "physics_agent", get_physics_constant, (constant,)
+
+
+def route_convert(match):
+    from_unit = UNIT_ALIASES.get(match.group("from").lower())
+    to_unit = UNIT_ALIASES.get(match.group("to").lower())
+    if not from_unit or not to_unit:
+        return None
+    return "physics_agent", convert_units, (float(match.group("value")), from_unit, to_unit)
+
+
+def route_dna_complement(match):
+    return "biology_agent", get_dna_complement, (match.group("seq"),)
+
+
+def route_molar_mass(match):
+    return "chemistry_agent", calculate_molar_mass, (match.group("formula"),)
+
+
+def route_element(match):
+    name = match.group("name").strip().lower()
+    key = ELEMENT_INDEX.get(name)
+    if not key:
+        return None
+    return "chemistry_agent", get_element_info, (key,)
+
+
+def route_ph(match):
+    return "chemistry_agent", calculate_ph, (float(match.group("conc")), True)
+
+
+# Ordered (pattern, handler) table; the first confident match wins
+ROUTES = [
+    (rf"(?:calculate|compute|evaluate|what\s+is|what's)\s+(?P<expr>{ARITHMETIC})\??", route_calculate),
+    (rf"solve\s*:?\s+(?:for\s+x\s*:?\s*)?(?P<eq>{EQUATION})", route_solve),
+    (rf"(?:graph|plot)\s+(?:f\(x\)\s*=\s*|y\s*=\s*)?(?P<func>{FUNCTION})", route_graph),
+    (rf"{QUESTION_PREFIX}(?P<name>[a-z' ]+?)\s*\??", route_constant),
+    (r"convert\s+(?P<value>-?\d+(?:\.\d+)?)\s*(?P<from>°?[a-z]+)\s+(?:to|into|in)\s+(?P<to>°?[a-z]+)\s*\??", route_convert),
+    (r"(?:find|get|what\s+is)?\s*(?:the\s+)?(?:dna\s+)?complement(?:ary\s+strand)?\s+(?:dna\s+)?(?:of|for)\s+(?:dna\s+)?(?:sequence\s+)?(?P<seq>[atgc]+)\s*\??", route_dna_complement),
+    (r"(?i:(?:calculate|compute|find|what\s+is)?\s*(?:the\s+)?molar\s+mass\s+(?:of\s+)?)(?P<formula>(?:[A-Z][a-z]?\d*)+)\s*\??", route_molar_mass),
+    (r"(?:what\s+is|tell\s+me\s+about)\s+(?:the\s+)?(?:element\s+|atomic\s+(?:mass|number)\s+of\s+)?(?P<name>[a-z]+)\s*\??", route_element),
+    (r"(?:calculate|find|what\s+is)\s+(?:the\s+)?ph\s+(?:with|of|for|when)\s+\[h\+\]\s*=\s*(?P<conc>\d+(?:\.\d+)?(?:e-?\d+)?)\s*m?\s*\??", route_ph),
+]
+# Molar-mass formulas are case sensitive (Co vs CO), so that route scopes its own flags
+COMPILED_ROUTES = [
+    (re.compile(pattern) if handler is route_molar_mass else re.compile(pattern, re.IGNORECASE), handler)
+    for pattern, handler in ROUTES
+]
+
+
+def match_fast_path(query: str):
+    """Return the candidate (agent, tool, args) plans for a query, best first"""
+    text = " ".join(query.strip().split())
+    plans = []
+    for pattern, handler in COMPILED_ROUTES:
+        match = pattern.fullmatch(text)
+        if not match:
+            continue
+        try:
+            plan = handler(match)
+        except Exception:
+            plan = None
+        if plan is not None:
+            plans.append(plan)
+    return plans
+
+
+async def run_fast_path(query: str):
+    """Return (agent, tool_name, result) when the query maps to a single tool call, else None"""
+    for agent, tool, args in match_fast_path(query):
+        start = time.perf_counter()
+        if tool in POOLED_TOOLS:
+            result = await POOLED_TOOLS[tool](*args)
+        else:
+            result = tool(*args)
+            if inspect.isawaitable(result):
+                result = await result
+        record_tool_call(tool.__name__, time.perf_counter() - start, is_error_result(result))
+        if any(marker in result.lower() for marker in ERROR_MARKERS):
+            continue
+        return agent, tool.__name__, result
+    return None
+
+
+def classify_query(query: str):
+    """Best-effort specialist for a query by keyword index; None when ambiguous"""
+    if SPECIALIST_PATTERNS["web_search_agent"].search(query):
+        return "web_search_agent"
+
+    scores = {}
+    for agent, pattern in SPECIALIST_PATTERNS.items():
+        hits = len(pattern.findall(query))
+        if hits:
+            scores[agent] = hits
+    if not scores:
+        return None
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+        return None
+    return ranked[0][0]
+
+
+def is_self_contained(query: str) -> bool:
+    """Whether a query can be understood without the conversation before it"""
+    return not FOLLOW_UP_REFERENCE.search(query)
+
+
+def is_standalone_question(clause: str) -> bool:
+    """Whether a clause is a question of its own rather than a continuation of the one before"""
+    return (bool(QUESTION_START.match(clause)) and not FOLLOW_UP_REFERENCE.search(clause)
+            and not DEFINITE_REFERENCE.search(clause))
+
+
+def split_query_parts(query: str) -> list:
+    """Split a question into [(specialist, part)] by subject, in question order
+
+    Clauses are classified one by one; a clause with no clear subject, the
+    same subject as the one before, or that isn't a question of its own
+    ("...and the chemical reaction involved") stays with the previous part.
+    A question whose first clause isn't a question of its own is not split,
+    so anything that isn't clearly several questions comes back as one part.
+    """
+    clauses = []
+    position = 0
+    for match in CLAUSE_SEPARATOR.finditer(query):
+        if match.start() > position:
+            clauses.append((position, match.start()))
+        position = match.end()
+    if position < len(query):
+        clauses.append((position, len(query)))
+
+    parts = []  # [start, end, specialist]
+    opening = None
+    for start, end in clauses:
+        text = query[start:end]
+        if not text.strip():
+            continue
+        if opening is None:
+            opening = text
+        specialist = classify_query(text)
+        if parts and parts[-1][2] is None:
+            # Leading clauses without a subject belong to the first one that has one
+            parts[-1][1:] = [end, specialist]
+        elif parts and (specialist is None or specialist == parts[-1][2] or not is_standalone_question(text)):
+            parts[-1][1] = end
+        else:
+            parts.append([start, end, specialist])
+
+    parts = [(specialist, query[start:end].strip(" ,;.")) for start, end, specialist in parts]
+    # Judge the opening clause on its own: clauses folded into it may refer back to it
+    if len(parts) > 1 and not is_standalone_question(opening):
+        return [(classify_query(query), query.strip())]
+    return parts
+
+
+async def try_fast_path(query: str):
+    """Route a query straight to a tool when confident, recording router stats"""
+    start = time.perf_counter()
+    routed = await run_fast_path(query)
+    elapsed = time.perf_counter() - start
+
+    ROUTER_STATS["queries"] += 1
+    if routed is None:
+        ROUTER_STATS["misses"] += 1
+        return None
+
+    agent, tool, result = routed
+    ROUTER_STATS["hits"] += 1
+    ROUTER_STATS["hits_by_tool"][tool] = ROUTER_STATS["hits_by_tool"].get(tool, 0) + 1
+    ROUTER_STATS["fast_path_seconds"] += elapsed
+    if ROUTER_STATS["agent_latency_avg_seconds"] is not None:
+        ROUTER_STATS["latency_saved_seconds"] += max(ROUTER_STATS["agent_latency_avg_seconds"] - elapsed, 0.0)
+    return agent, tool, result
+
+
+def record_agent_latency(seconds: float):
+    """Feed the moving average of full agent runs used to estimate latency saved"""
+    average = ROUTER_STATS["agent_latency_avg_seconds"]
+    if average is None:
+        ROUTER_STATS["agent_latency_avg_seconds"] = seconds
+    else:
+        ROUTER_STATS["agent_latency_avg_seconds"] = (1 - AGENT_LATENCY_ALPHA) * average + AGENT_LATENCY_ALPHA * seconds
+
+
+def get_router_stats() -> dict:
+    """Snapshot of fast-path router counters"""
+    queries = ROUTER_STATS["queries"]
+    return {
+        **ROUTER_STATS,
+        "hits_by_tool": dict(ROUTER_STATS["hits_by_tool"]),
+        "hit_rate": ROUTER_STATS["hits"] / queries if queries else 0.0,
+    }
@@ -0,0 +1,279 @@
+import asyncio
+import contextlib
+import logging
+import os
+import weakref
+
+from google.adk.events import Event
+from google.adk.sessions.state import State
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+SESSION_COMPACTION_ENABLED = os.getenv("SESSION_COMPACTION_ENABLED", "true").lower() == "true"
+# Compact once the replayed events are estimated above this many tokens
+SESSION_COMPACT_TRIGGER_TOKENS = int(os.getenv("SESSION_COMPACT_TRIGGER_TOKENS", "6000"))
+# Newest turns kept verbatim, further limited by their combined token estimate
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "4"))
+SESSION_KEEP_TOKENS = int(os.getenv("SESSION_KEEP_TOKENS", "3000"))
+SESSION_SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "1000"))
+
+# Rough English-text ratio; good enough to keep prompt sizes in the same ballpark
+CHARS_PER_TOKEN = 4
+SUMMARY_STATE_KEY = "conversation_summary"
+SUMMARY_HEADER = "[Summary of our earlier conversation]"
+# Per-line clip lengths for summarized turns
+SUMMARY_QUESTION_CHARS = 200
+SUMMARY_ANSWER_CHARS = 400
+
+COMPACTION_STATS = {
+    "checks": 0,
+    "compactions": 0,
+    "failures": 0,
+    "restores": 0,
+    "skipped_busy": 0,
+    "turns_summarized": 0,
+    "events_dropped": 0,
+    "tokens_before": 0,
+    "tokens_after": 0,
+}
+
+# Per-session lock taken to compact and to start a turn; a lock lives only while someone holds or awaits it
+COMPACTION_LOCKS = weakref.WeakValueDictionary()
+# Turns in progress per session (in this process); a session is only compacted when it has none
+ACTIVE_TURNS = {}
+# How often a turn retries while another worker holds the session's compaction lease
+TURN_LEASE_RETRY_SECONDS = 0.05
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text)
+
+
+def event_tokens(event: Event) -> int:
+    """Estimated prompt tokens for one event, including tool call arguments and results"""
+    if not event.content:
+        return 0
+    return estimate_tokens(event.content.model_dump_json(exclude_none=True))
+
+
+def is_summary_event(event: Event) -> bool:
+    return event.author == "user" and event_text(event).startswith(SUMMARY_HEADER)
+
+
+def is_consumed_event(event: Event) -> bool:
+    """Tool calls/results and agent transfers only matter inside the turn that produced them"""
+    return bool(event.get_function_calls() or event.get_function_responses()
+                or (event.actions and event.actions.transfer_to_agent))
+
+
+def split_turns(events: list) -> list:
+    """Group events into turns, each starting with a user message"""
+    turns = []
+    for event in events:
+        if event.author == "user" or not turns:
+            turns.append([])
+        turns[-1].append(event)
+    return turns
+
+
+def clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def summarize_turn(turn: list) -> str:
+    question = event_text(turn[0]) if turn[0].author == "user" else ""
+    answer, agent = "", None
+    for event in turn[1:]:
+        text = event_text(event)
+        if text and not event.partial:
+            answer, agent = text, event.author
+    line = f"- Student: {clip(question, SUMMARY_QUESTION_CHARS)}"
+    if answer:
+        line += f"\n  Tutor ({agent}): {clip(answer, SUMMARY_ANSWER_CHARS)}"
+    return line
+
+
+def merge_summary(previous: str, lines: list) -> str:
+    """Append new summary lines, dropping the oldest ones beyond the token budget"""
+    entries = (previous.split("\n- ") if previous else []) + [line[2:] for line in lines]
+    while len(entries) > 1 and estimate_tokens("\n- ".join(entries)) > SESSION_SUMMARY_MAX_TOKENS:
+        entries.pop(0)
+    return "\n- ".join(entries)
+
+
+def summary_event(summary: str, invocation_id: str) -> Event:
+    text = f"{SUMMARY_HEADER}\n- {summary}"
+    return Event(author="user", invocation_id=invocation_id,
+                 content=types.Content(role="user", parts=[types.Part(text=text)]))
+
+
+def plan_compaction(events: list, previous_summary: str):
+    """Return (summary, kept_events, turns_folded), or None if the session is still within budget"""
+    total = sum(event_tokens(event) for event in events)
+    if total <= SESSION_COMPACT_TRIGGER_TOKENS:
+        return None
+
+    turns = split_turns([event for event in events if not is_summary_event(event)])
+    # Completed turns no longer need their tool traffic, only question and answer
+    turns = [[event for event in turn if not is_consumed_event(event)] for turn in turns]
+
+    kept, kept_tokens = [], 0
+    for turn in reversed(turns):
+        tokens = sum(event_tokens(event) for event in turn)
+        if kept and (len(kept) >= SESSION_KEEP_TURNS or kept_tokens + tokens > SESSION_KEEP_TOKENS):
+            break
+        kept.insert(0, turn)
+        kept_tokens += tokens
+
+    folded = turns[:len(turns) - len(kept)]
+    summary = merge_summary(previous_summary, [summarize_turn(turn) for turn in folded if turn])
+    return summary, [event for turn in kept for event in turn], len(folded)
+
+
+async def rebuild_session(session_service, session, state: dict, events: list):
+    """Recreate session under its id with state and events, replacing whatever is stored now"""
+    try:
+        await session_service.delete_session(app_name=session.app_name, user_id=session.user_id,
+                                             session_id=session.id)
+    except Exception:
+        # Already gone, e.g. the delete was what failed to complete
+        pass
+    rebuilt = await session_service.create_session(app_name=session.app_name, user_id=session.user_id,
+                                                   state=state, session_id=session.id)
+    for event in events:
+        # State is already carried over; don't replay the deltas
+        event = event.model_copy(deep=True)
+        if event.actions:
+            event.actions.state_delta = {}
+        await session_service.append_event(rebuilt, event)
+
+
+def session_lock(key: tuple) -> asyncio.Lock:
+    lock = COMPACTION_LOCKS.get(key)
+    if lock is None:
+        lock = COMPACTION_LOCKS[key] = asyncio.Lock()
+    return lock
+
+
+@contextlib.asynccontextmanager
+async def session_turn(session_service, app_name: str, user_id: str, session_id: str, compact: bool = True):
+    """Hold an ADK session for one turn (an agent run or appended events), compacting it first
+
+    Compaction folds old turns into a summary so the replayed prompt stays
+    bounded. Session services have no API to rewrite events, so the session is
+    recreated with the same id and state, then the summary and the kept events
+    are appended; if that fails partway, it is rebuilt from the copy read
+    beforehand. Because of that delete, a session is only compacted when no
+    other turn is running on it, and no turn starts while it is being
+    compacted. Concurrent turns (two tabs on one session) still run side by side.
+
+    Within a process that is tracked in ACTIVE_TURNS. A session service shared
+    by several workers (SqliteSessionService) also provides acquire_lease() and
+    release_lease(), and every turn and compaction holds a lease in its database
+    so the rule holds across workers too.
+    """
+    key = (app_name, user_id, session_id)
+    async with session_lock(key):
+        if compact and SESSION_COMPACTION_ENABLED:
+            await _compact_if_idle(session_service, key)
+        lease = await _acquire_turn_lease(session_service, key)
+        ACTIVE_TURNS[key] = ACTIVE_TURNS.get(key, 0) + 1
+    try:
+        yield
+    finally:
+        if ACTIVE_TURNS[key] > 1:
+            ACTIVE_TURNS[key] -= 1
+        else:
+            del ACTIVE_TURNS[key]
+        if lease is not None:
+            session_service.release_lease(lease)
+
+
+def shares_sessions(session_service) -> bool:
+    """Whether other processes use the same sessions, so turns and compactions must hold leases"""
+    return hasattr(session_service, "acquire_lease")
+
+
+async def _acquire_turn_lease(session_service, key: tuple):
+    if not shares_sessions(session_service):
+        return None
+    while True:
+        lease = await session_service.acquire_lease(*key, "turn")
+        if lease is not None:
+            return lease
+        # Another worker is compacting the session; that is quick, and its lease expires regardless
+        await asyncio.sleep(TURN_LEASE_RETRY_SECONDS)
+
+
+async def _compact_if_idle(session_service, key: tuple) -> bool:
+    # Caller holds the session lock
+    COMPACTION_STATS["checks"] += 1
+    if ACTIVE_TURNS.get(key):
+        COMPACTION_STATS["skipped_busy"] += 1
+        return False
+    return await _compact_session(session_service, *key)
+
+
+async def _compact_session(session_service, app_name: str, user_id: str, session_id: str) -> bool:
+    session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+    if session is None or plan_compaction(session.events, session.state.get(SUMMARY_STATE_KEY, "")) is None:
+        return False
+    if not shares_sessions(session_service):
+        return await _rebuild_compacted(session_service, session)
+
+    # Only leased once compaction is due, so ordinary turns cost no extra write
+    lease = await session_service.acquire_lease(app_name, user_id, session_id, "compaction")
+    if lease is None:
+        # A turn is running on the session in another worker
+        COMPACTION_STATS["skipped_busy"] += 1
+        return False
+    try:
+        # Read again under the lease; another worker may have changed the session meanwhile
+        session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        return session is not None and await _rebuild_compacted(session_service, session)
+    finally:
+        session_service.release_lease(lease)
+
+
+async def _rebuild_compacted(session_service, session) -> bool:
+    session_id = session.id
+    plan = plan_compaction(session.events, session.state.get(SUMMARY_STATE_KEY, ""))
+    if plan is None:
+        return False
+    summary, kept_events, turns_folded = plan
+
+    state = {key: value for key, value in session.state.items() if not key.startswith(State.TEMP_PREFIX)}
+    events = ([summary_event(summary, kept_events[0].invocation_id if kept_events else "")] if summary else [])
+    try:
+        await rebuild_session(session_service, session, {**state, SUMMARY_STATE_KEY: summary}, events + kept_events)
+    except Exception as e:
+        COMPACTION_STATS["failures"] += 1
+        logger.error(f"Compacting session {session_id} failed: {e}; restoring it")
+        try:
+            await rebuild_session(session_service, session, state, session.events)
+            COMPACTION_STATS["restores"] += 1
+        except Exception as restore_error:
+            logger.error(f"Restoring session {session_id} after failed compaction failed: {restore_error}")
+        return False
+
+    COMPACTION_STATS["compactions"] += 1
+    COMPACTION_STATS["turns_summarized"] += turns_folded
+    COMPACTION_STATS["tokens_before"] += sum(event_tokens(event) for event in session.events)
+    COMPACTION_STATS["events_dropped"] += len(session.events) - len(events) - len(kept_events)
+    COMPACTION_STATS["tokens_after"] += sum(event_tokens(event) for event in events + kept_events)
+    logger.info(f"Compacted session {session_id}: {len(session.events)} -> {len(events) + len(kept_events)} events")
+    return True
+
+
+def get_compaction_stats() -> dict:
+    stats = dict(COMPACTION_STATS)
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+    return stats
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from datetime import datetime
+
+# Bounds for the in-process session store
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_MAX_HISTORY = int(os.getenv("SESSION_MAX_HISTORY", "200"))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", str(6 * 3600)))
+# Expired sessions are swept at most this often
+SESSION_SWEEP_INTERVAL_SECONDS = 60.0
+
+
+class HistoryEntry:
+    """One conversation message"""
+    __slots__ = ("role", "message", "timestamp")
+
+    def __init__(self, role: str, message: str, timestamp: float):
+        self.role = role
+        self.message = message
+        self.timestamp = timestamp
+
+    def to_dict(self) -> dict:
+        return {
+            "role": self.role,
+            "message": self.message,
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+
+
+class SessionRecord:
+    """A tutoring session; history keeps only the newest SESSION_MAX_HISTORY messages
+
+    message_count counts every message ever added, so a message's sequence
+    number (its cursor) stays stable after older ones fall out of history.
+    """
+    __slots__ = ("user_id", "created_at", "last_access", "history", "context", "message_count")
+
+    def __init__(self, user_id: str, max_history: int = SESSION_MAX_HISTORY):
+        now = time.time()
+        self.user_id = user_id
+        self.created_at = now
+        self.last_access = now
+        self.history = deque(maxlen=max_history)
+        self.context = {}
+        self.message_count = 0
+
+    def to_dict(self) -> dict:
+        """Same shape the API has always returned for a session"""
+        return {
+            "user_id": self.user_id,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "conversation_history": [entry.to_dict() for entry in self.history],
+            "context": self.context
+        }
+
+    def metadata(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "last_access": datetime.fromtimestamp(self.last_access).isoformat(),
+            "context": self.context,
+            "message_count": self.message_count,
+            "first_seq": self.message_count - len(self.history),
+        }
+
+    def page(self, since: int = None, before: int = None, limit: int = None) -> dict:
+        """A window of history by sequence number
+
+        since returns messages from that sequence number on, oldest first;
+        otherwise the newest messages older than before (or the newest overall).
+        limit caps the window either way. cursors.before fetches the next
+        older page and cursors.since picks up messages added later.
+        """
+        first_seq = self.message_count - len(self.history)
+        start, end = first_seq, self.message_count
+        if since is not None:
+            start = max(start, since)
+        if before is not None:
+            # Messages before first_seq have been trimmed; nothing older is left to return
+            end = max(min(end, before), first_seq)
+        if limit is not None:
+            if since is not None:
+                end = min(end, start + limit)
+            else:
+                start = max(start, end - limit)
+        start = min(start, end)
+
+        window = islice(self.history, start - first_seq, end - first_seq)
+        return {
+            **self.metadata(),
+            "conversation_history": [{**entry.to_dict(), "seq": seq}
+                                     for seq, entry in enumerate(window, start)],
+            "cursors": {
+                "before": start if start > first_seq else None,
+                "since": end,
+            },
+            "has_more": end < self.message_count,
+        }
+
+
+def message_size(message: str) -> int:
+    return sys.getsizeof(message)
+
+
+class SessionStore:
+    """Session records with a count cap, idle TTL expiry and LRU eviction
+
+    The methods are coroutines only to share an interface with
+    SqliteSessionStore, whose reads go to a thread; nothing here awaits I/O.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT, max_history: int = SESSION_MAX_HISTORY,
+                 idle_ttl: float = SESSION_IDLE_TTL_SECONDS, on_evict=None):
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.idle_ttl = idle_ttl
+        # Called with (session_id, record) whenever a session is dropped by the store
+        self.on_evict = on_evict
+        # Ordered by last access, least recent first
+        self._sessions = OrderedDict()
+        self._message_bytes = 0
+        self._message_count = 0
+        self._last_sweep = time.monotonic()
+        self.evictions = {"ttl": 0, "lru": 0, "history": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def create(self, user_id: str) -> str:
+        self._maybe_sweep()
+        session_id = f"session_{uuid.uuid4().hex[:8]}"
+        self._sessions[session_id] = SessionRecord(user_id, self.max_history)
+        while len(self._sessions) > self.max_sessions:
+            oldest_id = next(iter(self._sessions))
+            self._drop(oldest_id, "lru")
+        return session_id
+
+    async def get(self, session_id: str, touch: bool = True):
+        """Return the live record, or None if unknown or idle past the TTL"""
+        record = self._sessions.get(session_id)
+        if record is None:
+            return None
+        now = time.time()
+        if now - record.last_access > self.idle_ttl:
+            self._drop(session_id, "ttl")
+            return None
+        if touch:
+            record.last_access = now
+            self._sessions.move_to_end(session_id)
+        return record
+
+    async def add_message(self, session_id: str, role: str, message: str):
+        record = await self.get(session_id)
+        if record is None:
+            return
+        if len(record.history) == record.history.maxlen:
+            # The deque is about to drop its oldest message
+            dropped = record.history[0]
+            self._message_bytes -= message_size(dropped.message)
+            self._message_count -= 1
+            self.evictions["history"] += 1
+        record.history.append(HistoryEntry(role, message, time.time()))
+        record.message_count += 1
+        self._message_bytes += message_size(message)
+        self._message_count += 1
+
+    async def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._drop(session_id, None)
+        return True
+
+    def evict_expired(self):
+        """Drop every session idle past the TTL; they sit at the front of the LRU order"""
+        cutoff = time.time() - self.idle_ttl
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if record.last_access >= cutoff:
+                break
+            self._drop(session_id, "ttl")
+        self._last_sweep = time.monotonic()
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= SESSION_SWEEP_INTERVAL_SECONDS:
+            self.evict_expired()
+
+    def _drop(self, session_id: str, reason):
+        record = self._sessions.pop(session_id)
+        for entry in record.history:
+            self._message_bytes -= message_size(entry.message)
+        self._message_count -= len(record.history)
+        if reason:
+            self.evictions[reason] += 1
+        if self.on_evict:
+            self.on_evict(session_id, record)
+
+    async def get_stats(self) -> dict:
+        # Fixed per-object overheads plus the message strings themselves
+        record_bytes = sys.getsizeof(SessionRecord.__new__(SessionRecord)) + sys.getsizeof(deque())
+        entry_bytes = sys.getsizeof(HistoryEntry.__new__(HistoryEntry))
+        return {
+            "sessions": len(self._sessions),
+            "messages": self._message_count,
+            "message_bytes": self._message_bytes,
+            "estimated_bytes": (self._message_bytes + len(self._sessions) * record_bytes
+                                + self._message_count * entry_bytes),
+            "max_sessions": self.max_sessions,
+            "max_history": self.max_history,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": dict(self.evictions),
+        }
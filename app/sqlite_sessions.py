@@ -0,0 +1,613 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+from .session_store import (SessionRecord, HistoryEntry, SESSION_MAX_HISTORY, SESSION_IDLE_TTL_SECONDS,
+                            SESSION_SWEEP_INTERVAL_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_DB_POOL_SIZE = int(os.getenv("SESSION_DB_POOL_SIZE", "4"))
+# Sessions kept in each process's read-through cache
+SESSION_DB_CACHE_SIZE = int(os.getenv("SESSION_DB_CACHE_SIZE", "1000"))
+# Group commit: writes arriving within this window share one transaction
+SESSION_DB_BATCH_DELAY_SECONDS = float(os.getenv("SESSION_DB_BATCH_DELAY_SECONDS", "0.005"))
+SESSION_DB_BATCH_MAX_WRITES = 500
+# Leases marking a turn or a compaction in progress on a session, for every worker to see;
+# they expire so a worker that dies mid-turn can't block its sessions for good
+SESSION_TURN_LEASE_SECONDS = float(os.getenv("SESSION_TURN_LEASE_SECONDS", "600"))
+SESSION_COMPACTION_LEASE_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS adk_sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+CREATE TABLE IF NOT EXISTS adk_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS adk_events_by_session ON adk_events (app_name, user_id, session_id, id);
+CREATE TABLE IF NOT EXISTS adk_session_leases (
+    lease_id TEXT PRIMARY KEY,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS adk_session_leases_by_session ON adk_session_leases (app_name, user_id, session_id);
+CREATE TABLE IF NOT EXISTS adk_app_state (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS adk_user_state (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+CREATE TABLE IF NOT EXISTS tutor_sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tutor_sessions_by_access ON tutor_sessions (last_access);
+CREATE TABLE IF NOT EXISTS tutor_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tutor_messages_by_session ON tutor_messages (session_id, id);
+"""
+
+
+class SqliteDatabase:
+    """WAL-mode SQLite with a pool of reader connections and one batching writer thread"""
+
+    def __init__(self, path: str = SESSION_DB_PATH, pool_size: int = SESSION_DB_POOL_SIZE):
+        self.path = path
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        self._writes = queue.Queue()
+        self.stats = {"reads": 0, "writes": 0, "transactions": 0, "write_errors": 0}
+
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-session-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def fetch_all(self, sql: str, params: tuple = ()) -> list:
+        self.stats["reads"] += 1
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def fetch_one(self, sql: str, params: tuple = ()):
+        self.stats["reads"] += 1
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def write(self, sql: str, params: tuple = ()) -> Future:
+        """Queue a write for the next group commit; the future resolves to its rowcount once committed"""
+        future = Future()
+        self._writes.put((sql, params, future))
+        return future
+
+    async def write_async(self, sql: str, params: tuple = ()) -> int:
+        return await asyncio.wrap_future(self.write(sql, params))
+
+    def flush(self, timeout: float = 5.0):
+        """Block until every write queued so far is committed"""
+        self.write("SELECT 1").result(timeout)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._writes.get()]
+            # Collect whatever else arrives within the batching window
+            deadline = time.monotonic() + SESSION_DB_BATCH_DELAY_SECONDS
+            while len(batch) < SESSION_DB_BATCH_MAX_WRITES:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._writes.get(timeout=max(remaining, 0)) if remaining > 0
+                                 else self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit(conn, batch)
+            except Exception as e:
+                # Nothing may kill this thread: every later write and flush would hang
+                self._fail(batch, e)
+                if conn.in_transaction:
+                    try:
+                        conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+
+    def _fail(self, batch: list, error: Exception):
+        self.stats["write_errors"] += len(batch)
+        logger.error(f"SQLite session batch of {len(batch)} writes failed: {error}")
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit(self, conn: sqlite3.Connection, batch: list):
+        """Commit batch in one transaction; each write runs in a savepoint, so a bad one fails only itself"""
+        conn.execute("BEGIN IMMEDIATE")
+        outcomes = []  # (future, rowcount or exception)
+        for sql, params, future in batch:
+            conn.execute("SAVEPOINT batch_write")
+            try:
+                outcomes.append((future, conn.execute(sql, params).rowcount))
+            except sqlite3.Error as e:
+                if not conn.in_transaction:
+                    # SQLite aborted the whole transaction (disk full, I/O error)
+                    raise
+                conn.execute("ROLLBACK TO batch_write")
+                outcomes.append((future, e))
+            conn.execute("RELEASE batch_write")
+        conn.execute("COMMIT")
+
+        failed = [outcome for _, outcome in outcomes if isinstance(outcome, Exception)]
+        self.stats["writes"] += len(batch) - len(failed)
+        self.stats["write_errors"] += len(failed)
+        self.stats["transactions"] += 1
+        for error in failed:
+            logger.error(f"SQLite session write failed: {error}")
+        for future, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+
+def split_state_delta(delta: dict) -> tuple:
+    """Split an ADK state delta into (app, user, session) parts, dropping temp: keys"""
+    app_state, user_state, session_state = {}, {}, {}
+    for key, value in delta.items():
+        if key.startswith(State.APP_PREFIX):
+            app_state[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user_state[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session_state[key] = value
+    return app_state, user_state, session_state
+
+
+class SqliteSessionService(BaseSessionService):
+    """ADK session service persisted in SQLite so every uvicorn worker sees the same sessions
+
+    Sessions are cached per process; a cached session is reused only while its
+    last_update_time matches the database, so writes from other workers are
+    picked up on the next read.
+    """
+
+    def __init__(self, db: SqliteDatabase, cache_size: int = SESSION_DB_CACHE_SIZE):
+        self.db = db
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # Loads run on worker threads, so cache bookkeeping needs a lock
+        self._lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+    def _cache_put(self, key: tuple, session: Session):
+        with self._lock:
+            self._cache[key] = session
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _load_scoped_state(self, app_name: str, user_id: str) -> dict:
+        state = {}
+        row = self.db.fetch_one("SELECT state FROM adk_app_state WHERE app_name = ?", (app_name,))
+        if row:
+            state.update({State.APP_PREFIX + k: v for k, v in json.loads(row[0]).items()})
+        row = self.db.fetch_one("SELECT state FROM adk_user_state WHERE app_name = ? AND user_id = ?",
+                                (app_name, user_id))
+        if row:
+            state.update({State.USER_PREFIX + k: v for k, v in json.loads(row[0]).items()})
+        return state
+
+    def _load_session(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        row = self.db.fetch_one(
+            "SELECT state, last_update_time FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            key)
+        with self._lock:
+            if row is None:
+                self._cache.pop(key, None)
+                return None
+            cached = self._cache.get(key)
+            if cached is not None and cached.last_update_time == row[1]:
+                self._cache.move_to_end(key)
+                self.cache_stats["hits"] += 1
+                return cached
+
+        self.cache_stats["misses"] += 1
+        events = [Event.model_validate_json(event_json) for (event_json,) in self.db.fetch_all(
+            "SELECT event FROM adk_events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY id", key)]
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=json.loads(row[0]),
+                          events=events, last_update_time=row[1])
+        self._cache_put(key, session)
+        return session
+
+    def _merged_copy(self, session: Session) -> Session:
+        # Hand out copies so the runner can't mutate the cached session behind our back
+        copy = session.model_copy(deep=True)
+        copy.state.update(self._load_scoped_state(session.app_name, session.user_id))
+        return copy
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        existing = await asyncio.to_thread(self._load_session, app_name, user_id, session_id)
+        if existing is not None:
+            raise ValueError(f"Session with id {session_id} already exists.")
+
+        app_state, user_state, session_state = split_state_delta(state or {})
+        now = time.time()
+        await asyncio.to_thread(self._merge_scoped_state, app_name, user_id, app_state, user_state)
+        # A concurrent create of the same id may have passed the check above too; the insert decides
+        inserted = await self.db.write_async(
+            "INSERT INTO adk_sessions (app_name, user_id, session_id, state, last_update_time) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (app_name, user_id, session_id) DO NOTHING",
+            (app_name, user_id, session_id, json.dumps(session_state), now))
+        if not inserted:
+            raise ValueError(f"Session with id {session_id} already exists.")
+
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=session_state,
+                          events=[], last_update_time=now)
+        self._cache_put((app_name, user_id, session_id), session)
+        return self._merged_copy(session)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        session = await asyncio.to_thread(self._load_session, app_name, user_id, session_id)
+        if session is None:
+            return None
+
+        copy = self._merged_copy(session)
+        if config:
+            if config.num_recent_events:
+                copy.events = copy.events[-config.num_recent_events:]
+            if config.after_timestamp:
+                copy.events = [event for event in copy.events if event.timestamp >= config.after_timestamp]
+        return copy
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        rows = await asyncio.to_thread(
+            self.db.fetch_all,
+            "SELECT session_id, state, last_update_time FROM adk_sessions WHERE app_name = ? AND user_id = ?",
+            (app_name, user_id))
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=session_id, state=json.loads(state),
+                    events=[], last_update_time=last_update_time)
+            for session_id, state, last_update_time in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            self._cache.pop(key, None)
+        self.db.write("DELETE FROM adk_events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+        await self.db.write_async(
+            "DELETE FROM adk_sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        await super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+
+        key = (session.app_name, session.user_id, session.id)
+        delta = event.actions.state_delta if event.actions and event.actions.state_delta else {}
+        app_state, user_state, session_state = split_state_delta(delta)
+
+        cached = await asyncio.to_thread(self._load_session, *key)
+        if cached is None:
+            raise ValueError(f"Session {session.id} not found.")
+        cached.events.append(event)
+        cached.state.update(session_state)
+        cached.last_update_time = event.timestamp
+        session.last_update_time = event.timestamp
+
+        await asyncio.to_thread(self._merge_scoped_state, session.app_name, session.user_id, app_state, user_state)
+        self.db.write("INSERT INTO adk_events (app_name, user_id, session_id, event) VALUES (?, ?, ?, ?)",
+                      key + (event.model_dump_json(exclude_none=True),))
+        await self.db.write_async(
+            "UPDATE adk_sessions SET state = ?, last_update_time = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            (json.dumps(cached.state), event.timestamp) + key)
+        return event
+
+    async def acquire_lease(self, app_name: str, user_id: str, session_id: str, kind: str) -> Optional[str]:
+        """Take a "turn" or "compaction" lease on a session across all workers; None when refused
+
+        A compaction lease is refused while any other lease is live, and a turn
+        lease only while a compaction lease is, so turns run side by side but
+        never overlap a compaction. The check and insert are one statement in
+        the writer's BEGIN IMMEDIATE transaction, so two workers can't both pass.
+        Hand the returned id to release_lease().
+        """
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        ttl = SESSION_COMPACTION_LEASE_SECONDS if kind == "compaction" else SESSION_TURN_LEASE_SECONDS
+        conflicting = "" if kind == "compaction" else " AND kind = 'compaction'"
+        inserted = await self.db.write_async(
+            "INSERT INTO adk_session_leases (lease_id, app_name, user_id, session_id, kind, expires_at) "
+            "SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM adk_session_leases "
+            "WHERE app_name = ? AND user_id = ? AND session_id = ? AND expires_at > ?" + conflicting + ")",
+            (lease_id, app_name, user_id, session_id, kind, now + ttl, app_name, user_id, session_id, now))
+        return lease_id if inserted else None
+
+    def release_lease(self, lease_id: str):
+        """Give a lease back; queued rather than awaited so it also works from cleanup of a cancelled turn"""
+        self.db.write("DELETE FROM adk_session_leases WHERE lease_id = ? OR expires_at < ?", (lease_id, time.time()))
+
+    def _merge_scoped_state(self, app_name: str, user_id: str, app_state: dict, user_state: dict):
+        # Read-modify-write of shared state; last writer wins, as with the in-memory service
+        if app_state:
+            row = self.db.fetch_one("SELECT state FROM adk_app_state WHERE app_name = ?", (app_name,))
+            merged = {**(json.loads(row[0]) if row else {}), **app_state}
+            self.db.write("INSERT OR REPLACE INTO adk_app_state (app_name, state) VALUES (?, ?)",
+                          (app_name, json.dumps(merged)))
+        if user_state:
+            row = self.db.fetch_one("SELECT state FROM adk_user_state WHERE app_name = ? AND user_id = ?",
+                                    (app_name, user_id))
+            merged = {**(json.loads(row[0]) if row else {}), **user_state}
+            self.db.write("INSERT OR REPLACE INTO adk_user_state (app_name, user_id, state) VALUES (?, ?, ?)",
+                          (app_name, user_id, json.dumps(merged)))
+
+    def get_stats(self) -> dict:
+        return {**self.cache_stats, "cached_sessions": len(self._cache)}
+
+
+class SqliteSessionStore:
+    """Drop-in replacement for SessionStore that persists tutor sessions in SQLite
+
+    Writes are queued for the database's group commit rather than awaited, and
+    reads run on worker threads, so callers on the event loop never block on
+    the database. The cache itself is only touched on the loop. While a
+    session has writes in flight its cached record is authoritative; otherwise
+    the cache is revalidated against the row's version, so history appended by
+    another worker is picked up on the next read.
+    """
+
+    def __init__(self, db: SqliteDatabase, max_history: int = SESSION_MAX_HISTORY,
+                 idle_ttl: float = SESSION_IDLE_TTL_SECONDS, cache_size: int = SESSION_DB_CACHE_SIZE,
+                 on_evict=None):
+        self.db = db
+        self.max_history = max_history
+        self.idle_ttl = idle_ttl
+        self.cache_size = cache_size
+        # Called with (session_id, record) whenever a session is dropped by the store
+        self.on_evict = on_evict
+        # session_id -> (record, version); record is None for a delete that hasn't committed yet
+        self._cache = OrderedDict()
+        # session_id -> writes queued but not yet committed
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self.evictions = {"ttl": 0, "history": 0}
+
+    def _write(self, session_id: str, sql: str, params: tuple):
+        with self._pending_lock:
+            self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self.db.write(sql, params).add_done_callback(lambda _: self._write_done(session_id))
+
+    def _write_done(self, session_id: str):
+        with self._pending_lock:
+            remaining = self._pending.pop(session_id) - 1
+            if remaining:
+                self._pending[session_id] = remaining
+
+    def _cache_put(self, session_id: str, record, version: int):
+        self._cache[session_id] = (record, version)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def create(self, user_id: str) -> str:
+        await self._maybe_sweep()
+        session_id = f"session_{uuid.uuid4().hex[:8]}"
+        record = SessionRecord(user_id, self.max_history)
+        self._cache_put(session_id, record, 0)
+        self._write(session_id,
+                    "INSERT INTO tutor_sessions (session_id, user_id, created_at, last_access, version) "
+                    "VALUES (?, ?, ?, ?, 0)",
+                    (session_id, user_id, record.created_at, record.last_access))
+        return session_id
+
+    def _pending_record(self, session_id: str):
+        """(True, record) while the session has uncommitted writes and a cached record, else (False, None)"""
+        cached = self._cache.get(session_id)
+        if cached is not None and session_id in self._pending:
+            return True, cached[0]
+        return False, None
+
+    def _read(self, session_id: str, cached_version: Optional[int]) -> tuple:
+        """(session row, newest history rows); history is None when cached_version is still current"""
+        row = self.db.fetch_one(
+            "SELECT user_id, created_at, last_access, version FROM tutor_sessions WHERE session_id = ?",
+            (session_id,))
+        if row is None or row[3] == cached_version:
+            return row, None
+        return row, self.db.fetch_all(
+            "SELECT role, message, timestamp FROM tutor_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.max_history))
+
+    async def _load(self, session_id: str):
+        """Cached record if still current, else (re)loaded from the database; None if missing"""
+        pending, record = self._pending_record(session_id)
+        if pending:
+            self.cache_stats["hits"] += 1
+            return record
+
+        cached = self._cache.get(session_id)
+        cached_version = cached[1] if cached is not None and cached[0] is not None else None
+        row, rows = await asyncio.to_thread(self._read, session_id, cached_version)
+        # A write queued here while the read was out makes the cached record the newer one
+        pending, record = self._pending_record(session_id)
+        if pending:
+            return record
+        if row is None:
+            self._cache.pop(session_id, None)
+            return None
+        user_id, created_at, last_access, version = row
+
+        if rows is None:
+            cached = self._cache.get(session_id)
+            if cached is None or cached[0] is None or cached[1] != version:
+                # Evicted from the cache while the read was out; read again with history
+                return await self._load(session_id)
+            self.cache_stats["hits"] += 1
+            record = cached[0]
+        else:
+            self.cache_stats["misses"] += 1
+            record = SessionRecord(user_id, self.max_history)
+            record.created_at = created_at
+            record.history.extend(HistoryEntry(*row) for row in reversed(rows))
+            # version is bumped once per message, so it doubles as the message count
+            record.message_count = version
+        # Another worker may have touched the session more recently
+        record.last_access = max(record.last_access, last_access)
+        self._cache_put(session_id, record, version)
+        return record
+
+    async def get(self, session_id: str, touch: bool = True):
+        """Return the live record, or None if unknown or idle past the TTL"""
+        record = await self._load(session_id)
+        if record is None:
+            return None
+        now = time.time()
+        if now - record.last_access > self.idle_ttl:
+            self._drop(session_id, "ttl")
+            return None
+        if touch:
+            record.last_access = now
+            self._cache.move_to_end(session_id)
+            self._write(session_id, "UPDATE tutor_sessions SET last_access = ? WHERE session_id = ?",
+                        (now, session_id))
+        return record
+
+    async def add_message(self, session_id: str, role: str, message: str):
+        record = await self.get(session_id)
+        if record is None:
+            return
+        if len(record.history) == record.history.maxlen:
+            self.evictions["history"] += 1
+        entry = HistoryEntry(role, message, time.time())
+        record.history.append(entry)
+        record.message_count += 1
+
+        self._write(session_id, "INSERT INTO tutor_messages (session_id, role, message, timestamp) VALUES (?, ?, ?, ?)",
+                    (session_id, role, message, entry.timestamp))
+        # Keep only the newest max_history rows, matching the in-memory deque
+        self._write(session_id,
+                    "DELETE FROM tutor_messages WHERE session_id = ? AND id NOT IN "
+                    "(SELECT id FROM tutor_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, self.max_history))
+        self._write(session_id, "UPDATE tutor_sessions SET version = version + 1 WHERE session_id = ?",
+                    (session_id,))
+        version = self._cache[session_id][1] + 1
+        self._cache_put(session_id, record, version)
+
+    async def delete(self, session_id: str) -> bool:
+        if await self._load(session_id) is None:
+            return False
+        self._drop(session_id, None)
+        return True
+
+    async def evict_expired(self):
+        cutoff = time.time() - self.idle_ttl
+        self._last_sweep = time.monotonic()
+        rows = await asyncio.to_thread(self.db.fetch_all,
+                                       "SELECT session_id FROM tutor_sessions WHERE last_access < ?", (cutoff,))
+        for (session_id,) in rows:
+            # Skip sessions touched here whose last_access hasn't been committed yet
+            cached = self._cache.get(session_id)
+            if cached is None or cached[0] is None or cached[0].last_access < cutoff:
+                self._drop(session_id, "ttl")
+
+    async def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= SESSION_SWEEP_INTERVAL_SECONDS:
+            await self.evict_expired()
+
+    def _drop(self, session_id: str, reason):
+        cached = self._cache.get(session_id)
+        record = cached[0] if cached else None
+        # Tombstone until the delete commits so reads here don't resurrect the row
+        self._cache_put(session_id, None, -1)
+        self._write(session_id, "DELETE FROM tutor_messages WHERE session_id = ?", (session_id,))
+        self._write(session_id, "DELETE FROM tutor_sessions WHERE session_id = ?", (session_id,))
+        if reason:
+            self.evictions[reason] += 1
+        if self.on_evict and record is not None:
+            self.on_evict(session_id, record)
+
+    def _count_rows(self) -> tuple:
+        sessions, = self.db.fetch_one("SELECT COUNT(*) FROM tutor_sessions")
+        messages, message_bytes = self.db.fetch_one(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(message)), 0) FROM tutor_messages")
+        return sessions, messages, message_bytes
+
+    async def get_stats(self) -> dict:
+        # Whole-table scans; run off the loop so the admin page can't stall queries
+        sessions, messages, message_bytes = await asyncio.to_thread(self._count_rows)
+        return {
+            "backend": "sqlite",
+            "path": self.db.path,
+            "sessions": sessions,
+            "messages": messages,
+            "message_bytes": message_bytes,
+            "cached_sessions": len(self._cache),
+            "pending_sessions": len(self._pending),
+            "cache": dict(self.cache_stats),
+            "max_history": self.max_history,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": dict(self.evictions),
+            "database": dict(self.db.stats),
+        }
@@ -0,0 +1,47 @@
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Dependencies that should stay unimported in the server until first use
+LAZY_MODULES = ("sympy", "numpy", "matplotlib", "langchain_community")
+
+_started = time.perf_counter()
+STARTUP_PHASES = {}
+_ready_seconds = None
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time one step of server startup (usually a group of imports)"""
+    start = time.perf_counter()
+    modules_before = len(sys.modules)
+    try:
+        yield
+    finally:
+        STARTUP_PHASES[name] = {
+            "seconds": round(time.perf_counter() - start, 4),
+            "modules_imported": len(sys.modules) - modules_before,
+        }
+
+
+def mark_ready():
+    """Record the time from this module's import to the app accepting requests, and log the report"""
+    global _ready_seconds
+    _ready_seconds = round(time.perf_counter() - _started, 4)
+    for name, phase in STARTUP_PHASES.items():
+        logger.info(f"Startup {name}: {phase['seconds'] * 1000:.0f} ms ({phase['modules_imported']} modules)")
+    loaded = [name for name in LAZY_MODULES if name in sys.modules]
+    logger.info(f"Startup ready in {_ready_seconds * 1000:.0f} ms; "
+                f"lazy modules already loaded: {', '.join(loaded) or 'none'}")
+
+
+def get_startup_report() -> dict:
+    return {
+        "phases": STARTUP_PHASES,
+        "ready_seconds": _ready_seconds,
+        "modules_loaded": len(sys.modules),
+        "lazy_modules_loaded": {name: name in sys.modules for name in LAZY_MODULES},
+    }
@@ -28,7 +28,7 @@ BIOLOGY_DATA = {
     }
 }
 
-def get_biology_info(topic: str, subtopic: str = None) -> str:
+def get_biology_info(topic: str, subtopic: Optional[str] = None) -> str:
     """Get information about biological topics"""
     topic = topic.lower().replace(" ", "_")
     
@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .instrumentation import call_instrumented
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing and per-call wall-clock limit for CPU-bound tools
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+# "spawn" is safe alongside the server's threads; "fork" starts faster on Linux
+TOOL_POOL_START_METHOD = os.getenv("TOOL_POOL_START_METHOD", "spawn")
+
+# Modules imported in each worker before it takes real work
+WARM_MODULES = ("app.tools.math_tools",)
+# Also call each warm module's warm_up() so sympy and matplotlib are initialized
+# in the background rather than on a student's first request
+TOOL_WARMUP = os.getenv("TOOL_WARMUP", "true").lower() == "true"
+
+
+class ToolTimeoutError(Exception):
+    """A tool call exceeded its wall-clock limit and its worker was killed"""
+
+
+def _warm_worker(module_names: tuple, warm_up: bool = TOOL_WARMUP) -> dict:
+    """Import (and warm up) heavy modules in a fresh worker so the first call isn't charged for it
+
+    Returns seconds spent per module.
+    """
+    timings = {}
+    for name in module_names:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        if warm_up and hasattr(module, "warm_up"):
+            module.warm_up()
+        timings[name] = round(time.perf_counter() - start, 4)
+    return timings
+
+
+class ToolWorkerPool:
+    """Bounded set of single-process executors that can be killed individually
+
+    Each worker is its own one-process ProcessPoolExecutor so a call that hangs
+    can be terminated and replaced without disturbing calls running elsewhere.
+    """
+
+    def __init__(self, size: int = TOOL_WORKERS, warm_modules: tuple = WARM_MODULES):
+        self.size = size
+        self.warm_modules = warm_modules
+        self._context = multiprocessing.get_context(TOOL_POOL_START_METHOD)
+        self._loop = None
+        # Workers that have finished warming up and aren't running a call
+        self._idle = None
+        self._workers = set()
+        self.stats = {"calls": 0, "timeouts": 0, "crashes": 0, "cancelled": 0, "recycled": 0, "waiting": 0}
+        # Warm-up seconds per module, from the most recently warmed worker
+        self.warmup = {}
+
+    def _new_worker(self):
+        """Spawn a worker; it joins the idle queue once warmed up, so no call's timeout pays for that"""
+        worker = ProcessPoolExecutor(max_workers=1, mp_context=self._context)
+        self._workers.add(worker)
+        worker.submit(_warm_worker, self.warm_modules).add_done_callback(
+            functools.partial(self._warmed, worker))
+
+    def _warmed(self, worker: ProcessPoolExecutor, future):
+        # Runs on the executor's management thread
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            # Still handed out: a broken worker is recycled by the call that finds it
+            logger.warning(f"Tool worker warm-up failed: {future.exception()}")
+        else:
+            self.warmup = future.result()
+            logger.info(f"Tool worker warmed up: {self.warmup}")
+        try:
+            self._loop.call_soon_threadsafe(self._ready, worker)
+        except RuntimeError:
+            # The event loop has closed (shutdown)
+            pass
+
+    def _ready(self, worker: ProcessPoolExecutor):
+        if worker in self._workers and self._idle is not None:
+            self._idle.put_nowait(worker)
+
+    def _kill_worker(self, worker: ProcessPoolExecutor):
+        # ProcessPoolExecutor has no public API to stop a running task, so terminate its process
+        for process in list((worker._processes or {}).values()):
+            process.terminate()
+        worker.shutdown(wait=False, cancel_futures=True)
+        self._workers.discard(worker)
+
+    def _recycle(self, worker: ProcessPoolExecutor):
+        self._kill_worker(worker)
+        self.stats["recycled"] += 1
+        self._new_worker()
+
+    def start(self):
+        """Spawn and warm the workers (idempotent, needs a running event loop)"""
+        if self._idle is None:
+            self._loop = asyncio.get_running_loop()
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._new_worker()
+
+    async def run(self, func, *args, timeout: float = TOOL_TIMEOUT_SECONDS, **kwargs):
+        """Run func(*args, **kwargs) in a worker, killing the worker if it overruns timeout"""
+        self.start()
+        self.stats["waiting"] += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self.stats["waiting"] -= 1
+
+        self.stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        reusable = False
+        try:
+            # Instrumented inside the worker so CPU time and profiles reflect the actual work
+            future = loop.run_in_executor(worker, functools.partial(call_instrumented, func, args, kwargs))
+            result = await asyncio.wait_for(future, timeout)
+            reusable = True
+            return result
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning(f"Tool {func.__name__} timed out after {timeout:g}s; recycling worker")
+            raise ToolTimeoutError(f"{func.__name__} timed out after {timeout:g} seconds")
+        except BrokenProcessPool:
+            self.stats["crashes"] += 1
+            logger.error(f"Tool worker crashed while running {func.__name__}; recycling worker")
+            raise
+        except asyncio.CancelledError:
+            # The call keeps running in the worker, so it can't go back to the idle queue
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            # The tool itself raised; the worker is fine
+            reusable = True
+            raise
+        finally:
+            if reusable:
+                self._idle.put_nowait(worker)
+            else:
+                self._recycle(worker)
+
+    async def broadcast(self, func, timeout: float = TOOL_TIMEOUT_SECONDS) -> list:
+        """Run func() once in every worker (e.g. to collect per-process stats)"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(worker, func) for worker in list(self._workers)]
+        results = await asyncio.gather(*[asyncio.wait_for(future, timeout) for future in futures],
+                                       return_exceptions=True)
+        return [result for result in results if not isinstance(result, BaseException)]
+
+    def shutdown(self):
+        for worker in list(self._workers):
+            self._kill_worker(worker)
+        self._idle = None
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "workers": self.size, "timeout_seconds": TOOL_TIMEOUT_SECONDS,
+                "warmup_seconds": self.warmup}
+
+
+tool_pool = ToolWorkerPool()
+
+
+def run_in_tool_pool(func, timeout: float = None, fast_path=None):
+    """Wrap a synchronous tool as an async tool that runs in the worker pool
+
+    The wrapper keeps the tool's name, docstring and signature so it can be
+    registered on an agent in place of the original function. fast_path, if
+    given, is tried in-process first with the same arguments; a non-None
+    result is returned without a round-trip to the pool.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if fast_path is not None:
+            result = fast_path(*args, **kwargs)
+            if result is not None:
+                return result
+
+        limit = timeout or TOOL_TIMEOUT_SECONDS
+        try:
+            return await tool_pool.run(func, *args, timeout=limit, **kwargs)
+        except ToolTimeoutError:
+            return f"Error: {func.__name__} took longer than {limit:g} seconds and was stopped. Try a simpler input."
+        except BrokenProcessPool:
+            return f"Error: {func.__name__} crashed while processing this input."
+
+    return wrapper
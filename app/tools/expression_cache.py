@@ -0,0 +1,127 @@
+import os
+import sys
+from collections import OrderedDict
+
+# sympy is imported on first use: it costs seconds, and the server process
+# never parses expressions itself (tool workers do, and warm it up early)
+
+# Per-cache bounds; tools run in worker processes so each worker holds its own copy
+EXPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("EXPRESSION_CACHE_MAX_ENTRIES", "2048"))
+EXPRESSION_CACHE_MAX_BYTES = int(os.getenv("EXPRESSION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Rough footprint of a lambdified numpy callable (code object, globals dict)
+LAMBDIFY_ENTRY_BYTES = 8 * 1024
+
+
+class BoundedCache:
+    """LRU mapping capped by entry count and by an estimated byte size"""
+
+    def __init__(self, name: str, max_entries: int = EXPRESSION_CACHE_MAX_ENTRIES,
+                 max_bytes: int = EXPRESSION_CACHE_MAX_BYTES):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, size: int):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+parse_cache = BoundedCache("parse")
+solve_cache = BoundedCache("solve")
+lambdify_cache = BoundedCache("lambdify")
+
+
+def normalize_expression(text: str) -> str:
+    """Cache key for an expression string: surrounding and repeated whitespace don't matter"""
+    return " ".join(text.split())
+
+
+def estimate_size(key: str, value) -> int:
+    # The printed form grows with the expression tree, which is what dominates memory
+    return sys.getsizeof(key) + sys.getsizeof(str(value))
+
+
+def parse_expression(text: str):
+    """sp.sympify with memoization; sympy expressions are immutable so sharing is safe"""
+    key = normalize_expression(text)
+    expr = parse_cache.get(key)
+    if expr is None:
+        import sympy as sp
+        expr = sp.sympify(key)
+        parse_cache.put(key, expr, estimate_size(key, expr))
+    return expr
+
+
+def solve_equation_cached(left: str, right: str, symbol: str = "x") -> list:
+    """Solutions of left = right for symbol, memoized on the normalized equation"""
+    key = (normalize_expression(left), normalize_expression(right), symbol)
+    solution = solve_cache.get(key)
+    if solution is None:
+        import sympy as sp
+        eq = sp.Eq(parse_expression(left), parse_expression(right))
+        solution = sp.solve(eq, sp.Symbol(symbol))
+        solve_cache.put(key, solution, estimate_size(" = ".join(key), solution))
+    # sp.solve returns a list; hand out copies so callers can't mutate the cached one
+    return list(solution)
+
+
+def lambdify_expression(text: str, symbols="x"):
+    """Numpy callable for an expression, memoized on the normalized input
+
+    symbols is one variable name or a sequence of names, in argument order.
+    """
+    names = (symbols,) if isinstance(symbols, str) else tuple(symbols)
+    key = (normalize_expression(text), names)
+    func = lambdify_cache.get(key)
+    if func is None:
+        import sympy as sp
+        func = sp.lambdify([sp.Symbol(name) for name in names], parse_expression(text), "numpy")
+        lambdify_cache.put(key, func, sys.getsizeof(key[0]) + LAMBDIFY_ENTRY_BYTES)
+    return func
+
+
+def get_expression_cache_stats() -> dict:
+    return {cache.name: cache.get_stats() for cache in (parse_cache, solve_cache, lambdify_cache)}
+
+
+def clear_expression_caches():
+    for cache in (parse_cache, solve_cache, lambdify_cache):
+        cache.clear()
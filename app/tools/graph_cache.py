@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+
+# Rendered graphs are content-addressed files shared by every process on the box,
+# fronted by a per-process in-memory LRU
+GRAPH_CACHE_DIR = os.getenv("GRAPH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ai_tutor_graphs"))
+GRAPH_CACHE_MAX_FILES = int(os.getenv("GRAPH_CACHE_MAX_FILES", "2000"))
+GRAPH_CACHE_MEMORY_BYTES = int(os.getenv("GRAPH_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+# Raw (function, range, format) strings already mapped to a graph id
+GRAPH_ALIAS_MAX_ENTRIES = int(os.getenv("GRAPH_ALIAS_MAX_ENTRIES", "4096"))
+
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+GRAPH_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_aliases = OrderedDict()
+
+GRAPH_CACHE_STATS = {"alias_hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "pruned": 0}
+
+
+def graph_key(canonical_expr: str, x_min: float, x_max: float, options: dict) -> str:
+    """Content address of a graph: hash of the canonical expression, range and render options"""
+    payload = json.dumps({"expr": canonical_expr, "range": [x_min, x_max], "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def is_valid_graph_file(graph_id: str, image_format: str) -> bool:
+    return bool(GRAPH_ID_PATTERN.fullmatch(graph_id)) and image_format in MEDIA_TYPES
+
+
+def graph_path(graph_id: str, image_format: str) -> str:
+    return os.path.join(GRAPH_CACHE_DIR, f"{graph_id}.{image_format}")
+
+
+def has_graph(graph_id: str, image_format: str) -> bool:
+    """Check the disk cache, refreshing the file's age so hot graphs survive pruning"""
+    try:
+        os.utime(graph_path(graph_id, image_format))
+        return True
+    except OSError:
+        return False
+
+
+def write_graph(graph_id: str, image_format: str, image: bytes):
+    """Atomically write a rendered graph into the disk cache"""
+    os.makedirs(GRAPH_CACHE_DIR, exist_ok=True)
+    path = graph_path(graph_id, image_format)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(image)
+    os.replace(temp_path, path)
+    GRAPH_CACHE_STATS["writes"] += 1
+    prune_graphs()
+
+
+def prune_graphs():
+    """Delete the least recently used graphs beyond GRAPH_CACHE_MAX_FILES"""
+    try:
+        entries = [entry for entry in os.scandir(GRAPH_CACHE_DIR)
+                   if entry.name.rsplit(".", 1)[-1] in MEDIA_TYPES]
+    except OSError:
+        return
+    excess = len(entries) - GRAPH_CACHE_MAX_FILES
+    if excess <= 0:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:excess]:
+        try:
+            os.remove(entry.path)
+            GRAPH_CACHE_STATS["pruned"] += 1
+        except OSError:
+            pass
+
+
+def _remember_in_memory(graph_file: str, image: bytes):
+    global _memory_bytes
+    if len(image) > GRAPH_CACHE_MEMORY_BYTES:
+        return
+    _memory[graph_file] = image
+    _memory_bytes += len(image)
+    while _memory_bytes > GRAPH_CACHE_MEMORY_BYTES:
+        _, evicted = _memory.popitem(last=False)
+        _memory_bytes -= len(evicted)
+
+
+def read_graph(graph_id: str, image_format: str):
+    """Return graph bytes from memory or disk, or None if not cached"""
+    graph_file = f"{graph_id}.{image_format}"
+    image = _memory.get(graph_file)
+    if image is not None:
+        _memory.move_to_end(graph_file)
+        GRAPH_CACHE_STATS["memory_hits"] += 1
+        return image
+
+    try:
+        with open(graph_path(graph_id, image_format), "rb") as f:
+            image = f.read()
+    except OSError:
+        GRAPH_CACHE_STATS["misses"] += 1
+        return None
+
+    GRAPH_CACHE_STATS["disk_hits"] += 1
+    _remember_in_memory(graph_file, image)
+    return image
+
+
+def lookup_alias(function: str, x_range: str, image_format: str):
+    """Graph id for an exact request seen before, skipping the render worker entirely"""
+    alias = (" ".join(function.split()), x_range.replace(" ", ""), image_format)
+    graph_id = _aliases.get(alias)
+    if graph_id is None or not has_graph(graph_id, image_format):
+        return None
+    _aliases.move_to_end(alias)
+    GRAPH_CACHE_STATS["alias_hits"] += 1
+    return graph_id
+
+
+def remember_alias(function: str, x_range: str, image_format: str, graph_id: str):
+    alias = (" ".join(function.split()), x_range.replace(" ", ""), image_format)
+    _aliases[alias] = graph_id
+    while len(_aliases) > GRAPH_ALIAS_MAX_ENTRIES:
+        _aliases.popitem(last=False)
+
+
+def get_graph_write_stats() -> dict:
+    """Write and prune counters; renders run in the tool workers, so these are collected from each"""
+    return {"writes": GRAPH_CACHE_STATS["writes"], "pruned": GRAPH_CACHE_STATS["pruned"]}
+
+
+def get_graph_cache_stats() -> dict:
+    return {
+        **GRAPH_CACHE_STATS,
+        "memory_entries": len(_memory),
+        "memory_bytes": _memory_bytes,
+        "aliases": len(_aliases),
+        "directory": GRAPH_CACHE_DIR,
+    }
@@ -0,0 +1,244 @@
+import atexit
+import cProfile
+import functools
+import inspect
+import io
+import json
+import logging
+import os
+import pstats
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+# Per-call records are appended as JSON lines to a rotating file per process
+TOOL_INSTRUMENTATION_ENABLED = os.getenv("TOOL_INSTRUMENTATION_ENABLED", "true").lower() == "true"
+TOOL_LOG_DIR = os.getenv("TOOL_LOG_DIR", "logs")
+TOOL_LOG_MAX_BYTES = int(os.getenv("TOOL_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TOOL_LOG_BACKUPS = int(os.getenv("TOOL_LOG_BACKUPS", "5"))
+
+# "off", "cprofile" (profile a sample of calls, keep slow ones) or "stack" (sample stacks of slow calls)
+TOOL_PROFILE_MODE = os.getenv("TOOL_PROFILE_MODE", "off").lower()
+TOOL_PROFILE_THRESHOLD_SECONDS = float(os.getenv("TOOL_PROFILE_THRESHOLD_SECONDS", "0.5"))
+TOOL_PROFILE_SAMPLE_RATE = float(os.getenv("TOOL_PROFILE_SAMPLE_RATE", "0.1"))
+STACK_SAMPLE_INTERVAL_SECONDS = 0.01
+PROFILE_TOP_FUNCTIONS = 25
+
+_record_logger = None
+_record_logger_pid = None
+_record_listener = None
+
+
+def record_logger() -> logging.Logger:
+    """Logger for this process's rotating record file
+
+    Tool workers are separate processes, so each gets its own file rather
+    than racing on one rotation. Logging only queues the record; a listener
+    thread does the file writes and rotation, so tools awaited on the event
+    loop never block on disk.
+    """
+    global _record_logger, _record_logger_pid, _record_listener
+    if _record_logger is None or _record_logger_pid != os.getpid():
+        os.makedirs(TOOL_LOG_DIR, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(TOOL_LOG_DIR, f"tool_calls.{os.getpid()}.jsonl"),
+                                      maxBytes=TOOL_LOG_MAX_BYTES, backupCount=TOOL_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records = queue.SimpleQueue()
+        _record_listener = QueueListener(records, handler)
+        _record_listener.start()
+        _record_logger = logging.getLogger(f"{__name__}.records")
+        _record_logger.handlers = [QueueHandler(records)]
+        _record_logger.propagate = False
+        _record_logger.setLevel(logging.INFO)
+        _record_logger_pid = os.getpid()
+    return _record_logger
+
+
+@atexit.register
+def close_record_log():
+    """Write out the records still queued and stop the listener thread"""
+    global _record_logger, _record_listener
+    if _record_listener is not None:
+        _record_listener.stop()
+    _record_logger = _record_listener = None
+
+
+def payload_size(value) -> int:
+    # Characters as the model sees them, which is what drives prompt size
+    return len(value) if isinstance(value, str) else len(str(value))
+
+
+def is_error_result(result) -> bool:
+    # Tools report failures as "Error ..." strings rather than raising
+    return isinstance(result, str) and result.lstrip().lower().startswith("error")
+
+
+def write_record(tool: str, wall: float, cpu, args: tuple, kwargs: dict, result, error: bool, **extra):
+    record = {
+        "ts": round(time.time(), 3),
+        "tool": tool,
+        "pid": os.getpid(),
+        "wall_ms": round(wall * 1000, 3),
+        "cpu_ms": round(cpu * 1000, 3) if cpu is not None else None,
+        "input_bytes": payload_size(args) + (payload_size(kwargs) if kwargs else 0),
+        "output_bytes": payload_size(result) if result is not None else 0,
+        "error": error,
+        "slow": wall >= TOOL_PROFILE_THRESHOLD_SECONDS,
+        **extra,
+    }
+    try:
+        record_logger().info(json.dumps(record, default=str))
+    except OSError as e:
+        logger.warning(f"Could not write tool record for {tool}: {e}")
+
+
+class StackSampler:
+    """One background thread that samples the stacks of calls running past the threshold
+
+    Fast calls cost a dict insert and delete; nothing is sampled until a call
+    has been running for TOOL_PROFILE_THRESHOLD_SECONDS.
+    """
+
+    def __init__(self, interval: float = STACK_SAMPLE_INTERVAL_SECONDS,
+                 threshold: float = TOOL_PROFILE_THRESHOLD_SECONDS):
+        self.interval = interval
+        self.threshold = threshold
+        # thread id -> (start time, Counter of collapsed stacks)
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+
+    def begin(self) -> Counter:
+        samples = Counter()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tool-stack-sampler", daemon=True)
+                self._thread.start()
+            self._active[threading.get_ident()] = (time.perf_counter(), samples)
+            self._wakeup.notify()
+        return samples
+
+    def end(self):
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wakeup.wait()
+                due = [(thread_id, samples) for thread_id, (start, samples) in self._active.items()
+                       if time.perf_counter() - start >= self.threshold]
+            if due:
+                frames = sys._current_frames()
+                for thread_id, samples in due:
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[collapse_stack(frame)] += 1
+            time.sleep(self.interval)
+
+
+def collapse_stack(frame) -> str:
+    """Root-first 'file:function:line;...' string, the format flame graph tools read"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+stack_sampler = StackSampler()
+
+
+def format_profile(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def call_instrumented(func, args: tuple, kwargs: dict):
+    """Run a synchronous tool, recording wall/CPU time, sizes and (for slow calls) a profile
+
+    Module-level so the tool pool can send it, with func, to worker processes.
+    """
+    if not TOOL_INSTRUMENTATION_ENABLED:
+        return func(*args, **kwargs)
+
+    profiler = None
+    samples = None
+    if TOOL_PROFILE_MODE == "cprofile" and random.random() < TOOL_PROFILE_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+    elif TOOL_PROFILE_MODE == "stack":
+        samples = stack_sampler.begin()
+
+    result, error = None, True
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        if profiler is not None:
+            result = profiler.runcall(func, *args, **kwargs)
+        else:
+            result = func(*args, **kwargs)
+        error = is_error_result(result)
+        return result
+    finally:
+        wall, cpu = time.perf_counter() - start, time.thread_time() - cpu_start
+        if samples is not None:
+            stack_sampler.end()
+        extra = {}
+        if wall >= TOOL_PROFILE_THRESHOLD_SECONDS:
+            if profiler is not None:
+                extra["profile"] = format_profile(profiler)
+            if samples:
+                extra["stacks"] = dict(samples.most_common(PROFILE_TOP_FUNCTIONS))
+        write_record(func.__name__, wall, cpu, args, kwargs, result, error, **extra)
+
+
+def instrument_tool(func):
+    """Wrap a tool where it is registered on an agent
+
+    Every call is counted and timed for /metrics and, when enabled, recorded
+    with its wall time, CPU time and input/output sizes. Async tools (pooled
+    tools, create_graph) only get wall time here; their CPU-bound work is
+    recorded by the worker process that runs it. The wrapper keeps the
+    tool's name, docstring, signature and sync/async nature.
+    """
+    # Imported here so worker processes, which only need call_instrumented, skip prometheus
+    from ..metrics import record_tool_call
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            result, error = None, True
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+                error = is_error_result(result)
+                return result
+            finally:
+                wall = time.perf_counter() - start
+                record_tool_call(name, wall, error)
+                if TOOL_INSTRUMENTATION_ENABLED:
+                    # awaited: wall time includes waiting for a pool worker or I/O
+                    write_record(name, wall, None, args, kwargs, result, error, awaited=True)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        error = True
+        try:
+            result = call_instrumented(func, args, kwargs)
+            error = is_error_result(result)
+            return result
+        finally:
+            record_tool_call(name, time.perf_counter() - start, error)
+    return wrapper
@@ -1,14 +1,39 @@
-import sympy as sp
-import matplotlib.pyplot as plt
-import numpy as np
 import io
-import base64
+import os
+
+from .executor import tool_pool, ToolTimeoutError
+from .numeric_eval import evaluate_numeric
+from .expression_cache import parse_expression, solve_equation_cached, lambdify_expression
+from .graph_cache import graph_key, has_graph, write_graph, lookup_alias, remember_alias
+
+# Image format create_graph renders ("png" or "svg")
+GRAPH_FORMAT = os.getenv("GRAPH_FORMAT", "png")
+# Everything that changes the rendered image; part of the graph cache key
+GRAPH_RENDER_OPTIONS = {"dpi": 150, "points": 400, "figsize": [8, 6], "version": 1}
+
+# Limits for evaluating expressions over arrays of values
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "100000"))
+BATCH_MAX_EXPRESSIONS = int(os.getenv("BATCH_MAX_EXPRESSIONS", "100"))
+# Rows shown to the model by the evaluate_batch tool
+BATCH_PREVIEW_ROWS = 20
+
+def calculate_expression_fast(expression: str):
+    """Result for plain arithmetic without sympy, or None when symbolic evaluation is needed"""
+    value = evaluate_numeric(expression)
+    if value is None:
+        return None
+    return f"Result: {value}"
 
 def calculate_expression(expression: str) -> str:
     """Calculate mathematical expressions safely"""
     try:
-        # Use sympy for safe evaluation
-        result = sp.sympify(expression)
+        # Plain arithmetic and common functions skip sympy entirely
+        fast_result = calculate_expression_fast(expression)
+        if fast_result is not None:
+            return fast_result
+        
+        # Use sympy for safe evaluation (parsed expressions are memoized)
+        result = parse_expression(expression)
         evaluated = float(result.evalf())
         return f"Result: {evaluated}"
     except Exception as e:
@@ -20,43 +45,143 @@ def solve_equation(equation: str) -> str:
         # Parse equation (assume format like "2*x + 5 = 11")
         if "=" in equation:
             left, right = equation.split("=")
-            eq = sp.Eq(sp.sympify(left.strip()), sp.sympify(right.strip()))
-            x = sp.Symbol('x')
-            solution = sp.solve(eq, x)
+            solution = solve_equation_cached(left, right, 'x')
             return f"Solution: x = {solution}"
         else:
             return "Please provide equation in format: expression = value"
     except Exception as e:
         return f"Error solving equation: {str(e)}"
 
-def create_graph(function: str, x_range: str = "-10,10") -> str:
+def render_graph(function: str, x_range: str = "-10,10", image_format: str = "png") -> bytes:
+    """Render a function graph to PNG or SVG bytes without pyplot global state"""
+    # numpy and matplotlib load on first render (tool workers pay for it in warm_up)
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    expr = parse_expression(function)
+    
+    # Parse range
+    x_min, x_max = map(float, x_range.split(','))
+    x_vals = np.linspace(x_min, x_max, GRAPH_RENDER_OPTIONS["points"])
+    
+    # Convert to numpy function; constants come back as scalars
+    f = lambdify_expression(function, 'x')
+    y_vals = np.broadcast_to(f(x_vals), x_vals.shape)
+    
+    # A fresh Figure per call keeps concurrent renders independent
+    fig = Figure(figsize=GRAPH_RENDER_OPTIONS["figsize"])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(x_vals, y_vals, 'b-', linewidth=2)
+    ax.grid(True)
+    ax.set_xlabel('x')
+    ax.set_ylabel('f(x)')
+    # Title from the parsed expression so equivalent inputs render identical images
+    ax.set_title(f'Graph of f(x) = {expr}')
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=image_format, dpi=GRAPH_RENDER_OPTIONS["dpi"], bbox_inches='tight')
+    return buffer.getvalue()
+
+def render_graph_cached(function: str, x_range: str = "-10,10", image_format: str = "png") -> str:
+    """Render a graph into the content-addressed graph cache and return its id"""
+    import sympy as sp
+    x_min, x_max = map(float, x_range.split(','))
+    # Equivalent inputs ("x^2 - 4*x + 4" vs "4 - 4*x + x**2") share one canonical form
+    canonical = sp.srepr(parse_expression(function))
+    graph_id = graph_key(canonical, x_min, x_max, {**GRAPH_RENDER_OPTIONS, "format": image_format})
+    
+    if not has_graph(graph_id, image_format):
+        write_graph(graph_id, image_format, render_graph(function, x_range, image_format))
+    return graph_id
+
+async def create_graph(function: str, x_range: str = "-10,10") -> str:
     """Create graph of mathematical function"""
     try:
-        x = sp.Symbol('x')
-        expr = sp.sympify(function)
+        graph_id = lookup_alias(function, x_range, GRAPH_FORMAT)
+        if graph_id is None:
+            # Canonicalizing and rendering run in the tool worker pool
+            graph_id = await tool_pool.run(render_graph_cached, function, x_range, GRAPH_FORMAT)
+            remember_alias(function, x_range, GRAPH_FORMAT, graph_id)
         
-        # Parse range
         x_min, x_max = map(float, x_range.split(','))
-        x_vals = np.linspace(x_min, x_max, 400)
-        
-        # Convert to numpy function
-        f = sp.lambdify(x, expr, 'numpy')
-        y_vals = f(x_vals)
-        
-        # Create plot
-        plt.figure(figsize=(8, 6))
-        plt.plot(x_vals, y_vals, 'b-', linewidth=2)
-        plt.grid(True)
-        plt.xlabel('x')
-        plt.ylabel('f(x)')
-        plt.title(f'Graph of f(x) = {function}')
-        
-        # Save plot and show
-        plt.savefig(f'graph_{function.replace("/", "_div_").replace("*", "_mult_")}.png', 
-                   dpi=150, bbox_inches='tight')
-        plt.show()
-        plt.close()
-        
-        return f"Graph created and displayed for f(x) = {function}. Range: [{x_min}, {x_max}]"
+        return (f"Graph created for f(x) = {function}. Range: [{x_min}, {x_max}]\n"
+                f"![Graph](/graphs/{graph_id}.{GRAPH_FORMAT})")
+    except ToolTimeoutError:
+        return f"Error creating graph: rendering f(x) = {function} took too long and was stopped"
     except Exception as e:
         return f"Error creating graph: {str(e)}"
+
+def evaluate_expressions(expressions: list, variables: dict) -> dict:
+    """Evaluate expressions over arrays of variable values, compiling each expression once
+    
+    Returns a columnar result: one column per variable and per expression, with
+    non-finite values as None, plus per-expression errors.
+    """
+    import numpy as np
+    
+    if not expressions:
+        raise ValueError("Provide at least one expression")
+    if len(expressions) > BATCH_MAX_EXPRESSIONS:
+        raise ValueError(f"At most {BATCH_MAX_EXPRESSIONS} expressions per batch")
+    
+    names = list(variables)
+    for name in names:
+        if not name.isidentifier():
+            raise ValueError(f"Invalid variable name '{name}'")
+    columns = [np.asarray(variables[name], dtype=float).ravel() for name in names]
+    lengths = {len(column) for column in columns}
+    if len(lengths) > 1:
+        raise ValueError("All variable arrays must have the same length")
+    rows = lengths.pop() if lengths else 1
+    if rows > BATCH_MAX_ROWS:
+        raise ValueError(f"At most {BATCH_MAX_ROWS} rows per batch")
+    
+    results = {name: column.tolist() for name, column in zip(names, columns)}
+    errors = {}
+    for expression in expressions:
+        try:
+            expr = parse_expression(expression)
+            missing = {str(symbol) for symbol in expr.free_symbols} - set(names)
+            if missing:
+                raise ValueError(f"No values given for {', '.join(sorted(missing))}")
+            
+            f = lambdify_expression(expression, names)
+            with np.errstate(all='ignore'):
+                values = np.broadcast_to(np.asarray(f(*columns), dtype=float), (rows,))
+            results[expression] = np.where(np.isfinite(values), values, None).tolist()
+        except Exception as e:
+            errors[expression] = str(e)
+    
+    return {"rows": rows, "columns": results, "errors": errors}
+
+def evaluate_batch(expressions: list[str], variable_names: list[str], values: list[list[float]]) -> str:
+    """Evaluate one or more expressions over lists of variable values (e.g. a worksheet table)
+    
+    values[i] holds the values of variable_names[i], one per table row, e.g.
+    expressions=["x**2 + 1"], variable_names=["x"], values=[[1, 2, 3]].
+    """
+    # Typed lists rather than a dict: a free-form object parameter has no schema the model API accepts
+    try:
+        if len(variable_names) != len(values):
+            raise ValueError("Give one list of values per variable name")
+        result = evaluate_expressions(expressions, dict(zip(variable_names, values)))
+        headers = list(result["columns"])
+        lines = [" | ".join(headers)]
+        for row in range(min(result["rows"], BATCH_PREVIEW_ROWS)):
+            lines.append(" | ".join(f"{result['columns'][header][row]:g}"
+                                    if result['columns'][header][row] is not None else "undefined"
+                                    for header in headers))
+        if result["rows"] > BATCH_PREVIEW_ROWS:
+            lines.append(f"... {result['rows'] - BATCH_PREVIEW_ROWS} more rows")
+        for expression, error in result["errors"].items():
+            lines.append(f"Error in {expression}: {error}")
+        return "\n".join(lines)
+    except Exception as e:
+        return f"Error evaluating batch: {str(e)}"
+
+def warm_up():
+    """Pay sympy's and matplotlib's first-use costs (imports, parser tables, font cache) up front"""
+    solve_equation_cached("x**2 - 1", "0")
+    render_graph("sin(x)", "-1,1", GRAPH_FORMAT)
@@ -0,0 +1,143 @@
+import ast
+import math
+import re
+from fractions import Fraction
+
+# Inputs longer than this go straight to sympy
+MAX_EXPRESSION_LENGTH = 500
+# Largest exponent / factorial argument the fast path will compute itself
+MAX_EXPONENT = 1000
+MAX_FACTORIAL = 170
+# Exact intermediate results bigger than this (in bits) are left to sympy
+MAX_EXACT_BITS = 4096
+
+# Decimal literals, as sympify's auto_number sees them
+DECIMAL_LITERAL = re.compile(r"(\d*\.\d*|\d+)([eE][+-]?\d+)?")
+# sympy gives a decimal literal at least this many significant digits (53 bits, a double)
+FLOAT_DIGITS = 15
+
+# The fast path must give exactly what sympify(expression).evalf() gives, so it
+# follows sympy's number model: integers and fractions stay exact (a Fraction)
+# and are rounded once at the end, while decimal literals are 53-bit floats
+# whose + - * / round exactly like IEEE doubles. Anything sympy evaluates at
+# higher precision (pi, E, sin, log, exp, float powers) goes to sympy.
+
+
+class NotNumeric(Exception):
+    """The expression needs symbolic evaluation"""
+
+
+def _check_size(value):
+    if isinstance(value, Fraction) and max(value.numerator.bit_length(),
+                                           value.denominator.bit_length()) > MAX_EXACT_BITS:
+        raise NotNumeric("exact value too large for the fast path")
+    return value
+
+
+def _binary(op, left, right):
+    exact = isinstance(left, Fraction) and isinstance(right, Fraction)
+    if isinstance(op, ast.Add):
+        return left + right if exact else float(left) + float(right)
+    if isinstance(op, ast.Sub):
+        return left - right if exact else float(left) - float(right)
+    if isinstance(op, ast.Mult):
+        return left * right if exact else float(left) * float(right)
+    if isinstance(op, ast.Div):
+        return left / right if exact else float(left) / float(right)
+    if not exact:
+        raise NotNumeric("sympy evaluates float powers and remainders at higher precision")
+    if isinstance(op, ast.FloorDiv):
+        return Fraction(left // right)
+    if isinstance(op, ast.Mod):
+        return left % right
+    if isinstance(op, ast.Pow):
+        if right.denominator != 1 or abs(right) > MAX_EXPONENT:
+            raise NotNumeric("irrational or oversized power")
+        return left ** int(right)
+    raise NotNumeric(f"unsupported operator {type(op).__name__}")
+
+
+def _sqrt(value):
+    # Only perfect squares are exact; sympy keeps anything else symbolic
+    if not isinstance(value, Fraction) or value < 0:
+        raise NotNumeric("sqrt needs symbolic evaluation")
+    numerator, denominator = math.isqrt(value.numerator), math.isqrt(value.denominator)
+    if numerator * numerator != value.numerator or denominator * denominator != value.denominator:
+        raise NotNumeric("sqrt of a non-square")
+    return Fraction(numerator, denominator)
+
+
+def _factorial(value):
+    if not isinstance(value, Fraction) or value.denominator != 1 or not 0 <= value <= MAX_FACTORIAL:
+        raise NotNumeric("factorial outside the fast path range")
+    return Fraction(math.factorial(int(value)))
+
+
+def _floor(value):
+    return Fraction(math.floor(value))
+
+
+def _ceiling(value):
+    return Fraction(math.ceil(value))
+
+
+# Functions whose result sympy computes exactly; names mirror what sp.sympify understands
+FUNCTIONS = {
+    "sqrt": _sqrt,
+    "Abs": abs, "abs": abs,
+    "floor": _floor, "ceiling": _ceiling,
+    "factorial": _factorial,
+}
+
+
+def _evaluate(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, int) and not isinstance(node.value, bool):
+            return Fraction(node.value)
+        if isinstance(node.value, float):
+            return node.value
+        raise NotNumeric(f"unsupported constant {node.value!r}")
+
+    if isinstance(node, ast.BinOp):
+        return _check_size(_binary(node.op, _evaluate(node.left), _evaluate(node.right)))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _evaluate(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in FUNCTIONS and not node.keywords and len(node.args) == 1):
+        return FUNCTIONS[node.func.id](_evaluate(node.args[0]))
+
+    raise NotNumeric(f"unsupported syntax {type(node).__name__}")
+
+
+def evaluate_numeric(expression: str):
+    """Evaluate plain arithmetic without sympy; None means the caller should use sympy
+
+    The result is the float sympy's evalf() would give. Anything symbolic,
+    irrational or numerically awkward (overflow, division by zero, complex
+    results) returns None so sympy decides the answer.
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        return None
+    for literal in DECIMAL_LITERAL.finditer(expression):
+        mantissa, exponent = literal.groups()
+        # Longer literals get a wider sympy Float than a double can hold
+        if ("." in mantissa or exponent) and len(mantissa.replace(".", "").lstrip("0")) > FLOAT_DIGITS:
+            return None
+    try:
+        # sympify reads ^ as exponentiation (convert_xor); swapping it for ** before
+        # parsing keeps Python's precedence and right-to-left grouping for powers
+        tree = ast.parse(expression.strip().replace("^", "**"), mode="eval")
+        # A Fraction is rounded to the nearest double once, as evalf() does
+        value = float(_evaluate(tree))
+    except (NotNumeric, SyntaxError, ArithmeticError, ValueError, TypeError):
+        return None
+
+    if not math.isfinite(value):
+        return None
+    return value
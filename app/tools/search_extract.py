@@ -0,0 +1,173 @@
+import math
+import os
+import re
+from collections import Counter
+
+# Cap on what one search hands the model; raw pages are often tens of thousands of tokens
+WEB_SEARCH_EXTRACT_ENABLED = os.getenv("WEB_SEARCH_EXTRACT_ENABLED", "true").lower() == "true"
+WEB_SEARCH_TOKEN_BUDGET = int(os.getenv("WEB_SEARCH_TOKEN_BUDGET", "1500"))
+# Passages are whole sentences grouped up to about this size
+PASSAGE_MAX_CHARS = int(os.getenv("WEB_SEARCH_PASSAGE_MAX_CHARS", "600"))
+# Passages this similar (Jaccard over word shingles) to one already kept are dropped
+DUPLICATE_SIMILARITY = 0.8
+
+# Rough size estimate, same as session compaction uses
+CHARS_PER_TOKEN = 4
+BM25_K1 = 1.5
+BM25_B = 0.75
+SHINGLE_WORDS = 3
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it", "its",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "what", "when", "where", "which",
+    "who", "why", "how", "will", "with", "about", "latest", "current", "today",
+}
+
+PARAGRAPH_BREAK = re.compile(r"\n+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WORD = re.compile(r"\w+")
+
+EXTRACT_STATS = {"searches": 0, "passages_considered": 0, "passages_kept": 0, "duplicates_dropped": 0,
+                 "input_tokens": 0, "output_tokens": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def terms(text: str) -> list:
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_MAX_CHARS) -> list:
+    """Group consecutive sentences of each paragraph into passages of at most about max_chars
+
+    Line breaks end a passage, so navigation and footer lines don't get glued
+    onto the article text next to them.
+    """
+    passages = []
+    for paragraph in PARAGRAPH_BREAK.split(text or ""):
+        current = ""
+        for sentence in SENTENCE_END.split(paragraph):
+            sentence = " ".join(sentence.split())
+            if not sentence:
+                continue
+            # A single over-long "sentence" (tables, menus) is cut rather than kept whole
+            while len(sentence) > max_chars:
+                if current:
+                    passages.append(current)
+                    current = ""
+                passages.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            passages.append(current)
+    return passages
+
+
+def bm25_scores(query_terms: list, documents: list) -> list:
+    """Okapi BM25 score of each tokenized document against the query terms"""
+    if not documents:
+        return []
+    average_length = sum(len(document) for document in documents) / len(documents) or 1
+    document_frequency = Counter(term for document in documents for term in set(document))
+    scores = []
+    for document in documents:
+        counts = Counter(document)
+        score = 0.0
+        for term in set(query_terms):
+            frequency = counts.get(term)
+            if not frequency:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+            score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        scores.append(score)
+    return scores
+
+
+def shingles(words: list) -> set:
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def is_duplicate(candidate: set, kept: list) -> bool:
+    for other in kept:
+        union = len(candidate | other)
+        if union and len(candidate & other) / union >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def extract_results(query: str, results, token_budget: int = WEB_SEARCH_TOKEN_BUDGET):
+    """Reduce Tavily results to the passages most relevant to query, within token_budget
+
+    Each result's snippet and raw page are split into passages and ranked
+    together with BM25; near-duplicates (syndicated copies of one story) are
+    dropped and the best passages are kept until the budget is spent. Every
+    kept passage stays under its source's url and title so the agent can cite
+    it. Anything other than a list of results (an error string) passes through.
+    """
+    if not isinstance(results, list):
+        return results
+
+    candidates = []  # (source index, position in source, text)
+    for source, result in enumerate(results):
+        if not isinstance(result, dict):
+            continue
+        texts = [result.get("content") or ""] + split_passages(result.get("raw_content") or "")
+        for position, text in enumerate(text for text in texts if text.strip()):
+            candidates.append((source, position, text))
+
+    tokenized = [terms(text) for _, _, text in candidates]
+    scores = bm25_scores(terms(query), tokenized)
+    ranked = sorted(range(len(candidates)), key=lambda i: (-scores[i], candidates[i][0], candidates[i][1]))
+
+    kept, kept_shingles, used, duplicates = [], [], 0, 0
+    for i in ranked:
+        source, position, text = candidates[i]
+        # Tavily's own snippet (position 0) is query-relevant even without a term match
+        if scores[i] <= 0 and position > 0:
+            continue
+        candidate_shingles = shingles(tokenized[i] or text.lower().split())
+        if is_duplicate(candidate_shingles, kept_shingles):
+            duplicates += 1
+            continue
+        cost = estimate_tokens(text)
+        if used + cost > token_budget:
+            continue
+        kept.append(i)
+        kept_shingles.append(candidate_shingles)
+        used += cost
+
+    # Sources in order of their best passage; passages in page order within a source
+    best_rank = {}
+    for rank, i in enumerate(kept):
+        best_rank.setdefault(candidates[i][0], rank)
+    extracted = []
+    for source in sorted(best_rank, key=best_rank.get):
+        result = results[source]
+        passages = sorted((candidates[i] for i in kept if candidates[i][0] == source), key=lambda c: c[1])
+        extracted.append({
+            "source": len(extracted) + 1,
+            "url": result.get("url"),
+            "title": result.get("title"),
+            "passages": [text for _, _, text in passages],
+        })
+
+    EXTRACT_STATS["searches"] += 1
+    EXTRACT_STATS["passages_considered"] += len(candidates)
+    EXTRACT_STATS["passages_kept"] += len(kept)
+    EXTRACT_STATS["duplicates_dropped"] += duplicates
+    EXTRACT_STATS["input_tokens"] += sum(estimate_tokens(text) for _, _, text in candidates)
+    EXTRACT_STATS["output_tokens"] += used
+    return extracted
+
+
+def get_extract_stats() -> dict:
+    return {**EXTRACT_STATS, "enabled": WEB_SEARCH_EXTRACT_ENABLED, "token_budget": WEB_SEARCH_TOKEN_BUDGET}
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from ..response_cache import normalize_query
+from .search_extract import WEB_SEARCH_EXTRACT_ENABLED, extract_results
+
+logger = logging.getLogger(__name__)
+
+# "tavily" searches the web; "fake" serves canned results offline (tests, load tests)
+WEB_SEARCH_BACKEND = os.getenv("WEB_SEARCH_BACKEND", "tavily").lower()
+# News moves in minutes, not hours, so entries live much shorter than cached answers
+WEB_SEARCH_CACHE_ENABLED = os.getenv("WEB_SEARCH_CACHE_ENABLED", "true").lower() == "true"
+WEB_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "600"))
+WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", "500"))
+WEB_SEARCH_FAKE_LATENCY_MS = float(os.getenv("WEB_SEARCH_FAKE_LATENCY_MS", "200"))
+
+_tavily_search = None
+
+
+def get_tavily_search():
+    """The Tavily langchain tool, built on first search
+
+    langchain_community takes seconds to import, so startup doesn't pay for it
+    and a server that never searches never loads it.
+    """
+    global _tavily_search
+    if _tavily_search is None:
+        from langchain_community.tools import TavilySearchResults
+        _tavily_search = TavilySearchResults(
+            max_results=5,
+            search_depth="advanced",
+            include_answer=True,
+            include_raw_content=True,
+            include_images=False,
+        )
+    return _tavily_search
+
+
+async def tavily_backend(query: str):
+    return await get_tavily_search().ainvoke({"query": query})
+
+
+class FakeSearchBackend:
+    """Deterministic offline stand-in for Tavily with the same result shape"""
+
+    def __init__(self, latency_ms: float = WEB_SEARCH_FAKE_LATENCY_MS, max_results: int = 5):
+        self.latency_ms = latency_ms
+        self.max_results = max_results
+        self.calls = 0
+
+    async def __call__(self, query: str) -> list:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        digest = hashlib.sha256(normalize_query(query).encode()).hexdigest()[:8]
+        return [
+            {
+                "url": f"https://example.org/{digest}/{rank}",
+                "title": f"Result {rank + 1} for {query}",
+                "content": f"Summary {rank + 1} about {query}.",
+                "raw_content": f"Full article {rank + 1} about {query}. " * 20,
+            }
+            for rank in range(self.max_results)
+        ]
+
+
+class SearchCache:
+    """LRU cache of search results with a TTL and single-flight lookups
+
+    Concurrent searches for the same normalized query share one backend call.
+    The call runs as its own task, so a caller that gives up (a cancelled
+    request) doesn't cancel it for the others. Failures are not cached.
+    """
+
+    def __init__(self, max_entries: int = WEB_SEARCH_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = WEB_SEARCH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "searches": 0, "errors": 0,
+                      "expired": 0, "evicted": 0}
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        results, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def put(self, key: str, results):
+        self._entries[key] = (results, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    async def search(self, query: str, backend):
+        """Cached results for query, calling backend(query) at most once per key at a time"""
+        key = normalize_query(query)
+        results = self.get(key)
+        if results is not None:
+            self.stats["hits"] += 1
+            return results
+        self.stats["misses"] += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["searches"] += 1
+            task = asyncio.ensure_future(backend(query))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        error = task.exception()
+        results = None if error is not None else task.result()
+        # The langchain tool reports failures as a string rather than raising
+        if error is not None or isinstance(results, str):
+            self.stats["errors"] += 1
+            logger.warning(f"Web search failed for '{key}': {error or results}")
+            return
+        self.put(key, results)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "backend": WEB_SEARCH_BACKEND,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+search_cache = SearchCache()
+fake_search_backend = FakeSearchBackend()
+
+
+def search_backend():
+    return fake_search_backend if WEB_SEARCH_BACKEND == "fake" else tavily_backend
+
+
+async def search_and_extract(query: str):
+    """Search, then cut raw pages down to the passages that matter (what gets cached)"""
+    results = await search_backend()(query)
+    if WEB_SEARCH_EXTRACT_ENABLED:
+        results = extract_results(query, results)
+    return results
+
+
+async def tavily_search_results_json(query: str):
+    """A search engine optimized for comprehensive, accurate, and trusted results. Useful for when you need to answer questions about current events. Input should be a search query."""
+    if not WEB_SEARCH_CACHE_ENABLED:
+        return await search_and_extract(query)
+    return await search_cache.search(query, search_and_extract)
@@ -0,0 +1,75 @@
+"""Compare calculate_expression's numeric fast path against the sympy-only path.
+
+Usage: python benchmarks/bench_calculate_expression.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sympy as sp
+
+from app.tools.math_tools import calculate_expression
+from app.tools.numeric_eval import evaluate_numeric
+
+# Expressions in the shape students actually send to calculate_expression
+CORPUS = [
+    "15 * 23 + 47",
+    "2^10",
+    "(3 + 4) * (5 - 2) / 7",
+    "0.1 + 0.2",
+    "12.5 * 4 - 3.75",
+    "100 / 8",
+    "sqrt(144) + 3^2",
+    "sin(pi/6) + cos(pi/3)",
+    "log(100, 10)",
+    "exp(2) - 1",
+    "2 * pi * 6.371e6",
+    "0.5 * 10 * 5^2",
+    "9.81 * 12 * 3.5",
+    "(1 + 0.05)^10 * 1000",
+    "factorial(6) / (factorial(2) * factorial(4))",
+    "abs(-17.3) + floor(4.7)",
+    "1/3 + 1/6",
+    "-7 % 3",
+    "tan(pi/4) * 45",
+    "sqrt(3^2 + 4^2)",
+]
+
+
+def sympy_only(expression: str) -> str:
+    """The pre-fast-path implementation of calculate_expression"""
+    return f"Result: {float(sp.sympify(expression).evalf())}"
+
+
+def time_per_call(func, repeat: int) -> float:
+    timer = timeit.Timer(lambda: [func(expression) for expression in CORPUS])
+    return min(timer.repeat(repeat=repeat, number=1)) / len(CORPUS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    covered = sum(evaluate_numeric(expression) is not None for expression in CORPUS)
+    mismatches = [expression for expression in CORPUS
+                  if calculate_expression(expression) != sympy_only(expression)]
+
+    baseline = time_per_call(sympy_only, args.repeat)
+    tiered = time_per_call(calculate_expression, args.repeat)
+
+    print(f"corpus size:         {len(CORPUS)}")
+    print(f"fast path coverage:  {covered}/{len(CORPUS)}")
+    print(f"sympy only:          {baseline * 1e6:10.1f} us/expression")
+    print(f"tiered evaluator:    {tiered * 1e6:10.1f} us/expression")
+    print(f"speedup:             {baseline / tiered:10.1f}x")
+    if mismatches:
+        print(f"result mismatches:   {mismatches}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
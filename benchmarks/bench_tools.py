@@ -0,0 +1,245 @@
+"""Microbenchmarks for the tutor's domain tools, with JSON baselines and a regression gate.
+
+Usage:
+    python benchmarks/bench_tools.py                          # run and print
+    python benchmarks/bench_tools.py --save baseline.json     # record a baseline
+    python benchmarks/bench_tools.py --compare baseline.json  # exit 1 on regressions
+    python benchmarks/bench_tools.py --filter dna --max-dna 1000000
+
+Baselines are machine specific; record and compare on the same host.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.tools.math_tools import calculate_expression, solve_equation, render_graph, evaluate_expressions
+from app.tools.expression_cache import clear_expression_caches
+from app.tools.physics_tools import get_physics_constant, convert_units, calculate_physics
+from app.tools.chemistry_tools import (get_element_info, calculate_molar_mass, get_chemistry_constant,
+                                       calculate_molarity, calculate_ph)
+from app.tools.biology_tools import get_biology_info, classify_organism, calculate_genetics, get_dna_complement
+from app.tools.instrumentation import is_error_result
+
+from bench_calculate_expression import CORPUS as ARITHMETIC_CORPUS
+
+# Each measurement loops until it has run at least this long, then the best of --repeat is kept
+MIN_MEASUREMENT_SECONDS = 0.05
+DEFAULT_THRESHOLD = 0.25
+
+# Symbolic work that still reduces to a number; calculate_expression rejects anything left symbolic
+SYMBOLIC_CORPUS = [
+    "expand((x + 1)**5).subs(x, 2)",
+    "diff(sin(x)*exp(x), x).subs(x, 1)",
+    "integrate(x**2, (x, 0, 3))",
+    "factor(x**3 - 1).subs(x, 3)",
+    "limit((1 + 1/x)**x, x, oo)",
+    "simplify(sin(x)**2 + cos(x)**2)",
+    "limit(sin(x)/x, x, 0)",
+    "Rational(3, 4) + Rational(5, 6)",
+]
+
+EQUATION_CORPUS = [
+    "2*x + 5 = 11",
+    "x**2 - 5*x + 6 = 0",
+    "3*x - 7 = 2*x + 4",
+    "x**2 = 16",
+    "x**3 - 6*x**2 + 11*x - 6 = 0",
+    "x/3 + 2 = 5",
+    "2**x = 32",
+    "sqrt(x) = 4",
+]
+
+GRAPH_CORPUS = [
+    ("x**2", "-10,10"),
+    ("sin(x)", "-6.28,6.28"),
+    ("exp(-x**2)", "-3,3"),
+    ("1/x", "-5,5"),
+]
+
+FORMULA_CORPUS = ["H2O", "NaCl", "CaCO3", "C6H12O6", "Fe2O3", "C12H22O11", "Al2(SO4)3", "CuSO4"]
+
+UNIT_CORPUS = [
+    (5.0, "m", "ft"),
+    (100.0, "km", "mi"),
+    (2.5, "kg", "lb"),
+    (37.0, "c", "f"),
+    (300.0, "k", "c"),
+    (12.0, "in", "m"),
+    (3.0, "ly", "km"),
+]
+
+PHYSICS_CORPUS = [
+    ("force", {"mass": 10, "acceleration": 9.81}),
+    ("kinetic_energy", {"mass": 1500, "velocity": 27.8}),
+    ("potential_energy", {"mass": 70, "height": 12}),
+]
+
+GENETICS_CORPUS = [
+    ("hardy_weinberg", {"p": 0.7}),
+    ("allele_frequency", {"q": 0.2}),
+    ("punnett_square", {"parent1": "Aa", "parent2": "Aa"}),
+    ("cross", {"parent1": "BB", "parent2": "Bb"}),
+]
+
+ORGANISM_CORPUS = [
+    "multicellular, heterotrophic, mobile, has a nucleus",
+    "performs photosynthesis, has cell wall and chlorophyll",
+    "single cell, no nucleus, prokaryotic",
+    "decomposer that reproduces with spores",
+]
+
+DNA_SIZES = [10, 1_000, 100_000, 1_000_000, 10_000_000]
+
+
+def dna_sequence(length: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("ATGC") for _ in range(length))
+
+
+def batch_grid(rows: int) -> dict:
+    step = 20 / rows
+    return {"x": [-10 + i * step for i in range(rows)]}
+
+
+class Case:
+    """One benchmark: calls func(*args, **kwargs) for every input in corpus"""
+
+    def __init__(self, name: str, func, corpus: list, setup=None):
+        self.name = name
+        self.func = func
+        self.corpus = corpus
+        self.setup = setup
+
+    def run_once(self) -> float:
+        if self.setup:
+            self.setup()
+        start = time.perf_counter()
+        for args, kwargs in self.corpus:
+            self.func(*args, **kwargs)
+        return time.perf_counter() - start
+
+    def failures(self) -> list:
+        """Inputs the tool answers with an error, which would time the error path instead of the work"""
+        return [args for args, kwargs in self.corpus if is_error_result(self.func(*args, **kwargs))]
+
+    def measure(self, repeat: int) -> float:
+        """Best seconds per call over repeat measurements"""
+        best = float("inf")
+        for _ in range(repeat):
+            elapsed, calls = 0.0, 0
+            while elapsed < MIN_MEASUREMENT_SECONDS or calls == 0:
+                elapsed += self.run_once()
+                calls += len(self.corpus)
+            best = min(best, elapsed / calls)
+        return best
+
+
+def positional(items) -> list:
+    return [((item,) if not isinstance(item, tuple) else item, {}) for item in items]
+
+
+def build_cases(max_dna: int, name_filter: str = "") -> list:
+    cases = [
+        Case("calculate_expression/arithmetic", calculate_expression, positional(ARITHMETIC_CORPUS)),
+        Case("calculate_expression/symbolic_warm", calculate_expression, positional(SYMBOLIC_CORPUS)),
+        Case("calculate_expression/symbolic_cold", calculate_expression, positional(SYMBOLIC_CORPUS),
+             setup=clear_expression_caches),
+        Case("solve_equation/warm", solve_equation, positional(EQUATION_CORPUS)),
+        Case("solve_equation/cold", solve_equation, positional(EQUATION_CORPUS), setup=clear_expression_caches),
+        # create_graph itself only adds a cache lookup and a pool round-trip around this
+        Case("create_graph/render_png", render_graph, [(args + ("png",), {}) for args in GRAPH_CORPUS]),
+        Case("create_graph/render_svg", render_graph, [(args + ("svg",), {}) for args in GRAPH_CORPUS]),
+        Case("evaluate_batch/100_rows", evaluate_expressions, [((["x**2 + 1", "sin(x)"], batch_grid(100)), {})]),
+        Case("evaluate_batch/10000_rows", evaluate_expressions,
+             [((["x**2 + 1", "sin(x)"], batch_grid(10_000)), {})]),
+        Case("calculate_molar_mass", calculate_molar_mass, positional(FORMULA_CORPUS)),
+        Case("convert_units", convert_units, positional(UNIT_CORPUS)),
+        Case("calculate_physics", calculate_physics, [((formula,), kwargs) for formula, kwargs in PHYSICS_CORPUS]),
+        Case("calculate_genetics", calculate_genetics, [((kind,), kwargs) for kind, kwargs in GENETICS_CORPUS]),
+        Case("calculate_molarity", calculate_molarity, [((), {"solute_moles": 2, "volume_liters": 0.5}),
+                                                        ((), {"molarity": 1.5, "volume_liters": 2})]),
+        Case("calculate_ph", calculate_ph, [((1e-3,), {}), ((2.5e-9, False), {})]),
+        Case("classify_organism", classify_organism, positional(ORGANISM_CORPUS)),
+        Case("lookup/get_physics_constant", get_physics_constant,
+             positional(["speed_of_light", "gravitational_constant", "planck_constant", "unknown"])),
+        Case("lookup/get_element_info", get_element_info, positional(["C", "Fe", "au", "Xx"])),
+        Case("lookup/get_chemistry_constant", get_chemistry_constant,
+             positional(["avogadro_number", "gas_constant", "unknown"])),
+        Case("lookup/get_biology_info", get_biology_info,
+             [(("organelles",), {}), (("cell_types", "eukaryotic"), {}), (("unknown",), {})]),
+    ]
+    for size in DNA_SIZES:
+        name = f"get_dna_complement/{size}bp"
+        # Building the 10 Mbp input alone takes seconds, so skip it unless selected
+        if size <= max_dna and name_filter in name:
+            cases.append(Case(name, get_dna_complement, [((dna_sequence(size),), {})]))
+    return cases
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names of cases slower than baseline by more than threshold (a fraction)"""
+    regressions = []
+    print(f"\n{'case':42} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:42} {'-':>12} {seconds * 1e6:10.2f}us {'new':>8}")
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:42} {before * 1e6:10.2f}us {seconds * 1e6:10.2f}us {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--max-dna", type=int, default=max(DNA_SIZES), help="largest DNA sequence to benchmark")
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="baseline file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing, as a fraction (default 0.25)")
+    args = parser.parse_args()
+
+    results = {}
+    for case in build_cases(args.max_dna, args.filter):
+        if args.filter not in case.name:
+            continue
+        failures = case.failures()
+        if failures:
+            sys.exit(f"{case.name}: the tool returned an error for {failures}; fix the corpus before timing it")
+        results[case.name] = case.measure(args.repeat)
+        print(f"{case.name:42} {results[case.name] * 1e6:12.2f} us/call")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
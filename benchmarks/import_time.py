@@ -0,0 +1,59 @@
+"""Per-module import cost of the server, from python -X importtime.
+
+Usage:
+    python benchmarks/import_time.py                 # top 30 packages importing main
+    python benchmarks/import_time.py --module app.tools.math_tools --top 15
+    python benchmarks/import_time.py --modules       # individual modules, not packages
+
+Times are self time (excluding the module's own imports), summed per top-level
+package unless --modules is given, so the biggest numbers are where a lazy
+import pays off. The running server reports its startup phases at
+/api/admin/startup.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> list:
+    """(module, self_us, cumulative_us) for every module imported by `import module`"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (default: the server)")
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--modules", action="store_true", help="report modules rather than packages")
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    totals = {}
+    for name, self_us, _ in rows:
+        key = name if args.modules else name.split(".")[0]
+        totals[key] = totals.get(key, 0) + self_us
+
+    total_us = sum(totals.values())
+    print(f"import {args.module}: {total_us / 1000:.0f} ms across {len(rows)} modules\n")
+    print(f"{'module' if args.modules else 'package':50} {'ms':>9} {'share':>7}")
+    for name, self_us in sorted(totals.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:50} {self_us / 1000:9.1f} {self_us / total_us:7.1%}")
+
+
+if __name__ == "__main__":
+    main()
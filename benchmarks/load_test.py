@@ -0,0 +1,149 @@
+"""Open-loop load generator for the tutor API.
+
+Replays queries from a JSONL file at a fixed request rate and reports latency
+percentiles, throughput and error rate. Each line needs a "query" field (or
+"body"/"title", so a backlog file like requests.jsonl works as-is); an optional
+"user_id" is passed through.
+
+To load-test the FastAPI + ADK stack offline, start the server with the fake
+model and the shortcuts that bypass the agents turned off:
+
+    FAKE_MODEL=true FAST_PATH_ENABLED=false RESPONSE_CACHE_ENABLED=false uvicorn main:app
+    python benchmarks/load_test.py traffic.jsonl --rps 20 --duration 60
+
+Latency is measured from each request's scheduled send time, so queueing in
+the generator counts against the server rather than hiding it.
+
+The server rate-limits each user (USER_RATE_PER_MINUTE, default 30, so 0.5 req/s
+per user). With the default 50 users, rates above about 25 req/s come back as
+429s and are counted as errors; raise --users, or USER_RATE_PER_MINUTE on the
+server, when measuring capacity rather than the rate limit.
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def load_queries(path: str) -> list:
+    queries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            query = item.get("query") or item.get("body") or item.get("title")
+            if query:
+                queries.append({"query": query, "user_id": item.get("user_id")})
+    if not queries:
+        raise SystemExit(f"No queries found in {path}")
+    return queries
+
+
+def post(url: str, payload: dict, timeout: float) -> int:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            # Read the whole body so streaming endpoints are timed to completion
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+async def run(args) -> dict:
+    queries = load_queries(args.file)
+    url = args.url.rstrip("/") + args.endpoint
+    total = args.requests or int(args.rps * args.duration)
+    executor = ThreadPoolExecutor(max_workers=args.max_in_flight)
+    loop = asyncio.get_running_loop()
+    latencies, statuses, errors = [], {}, 0
+
+    async def one(index: int, scheduled: float):
+        nonlocal errors
+        item = queries[index % len(queries)]
+        payload = {"query": item["query"], "user_id": item["user_id"] or f"load_user_{index % args.users}"}
+        try:
+            status = await loop.run_in_executor(executor, post, url, payload, args.timeout)
+        except Exception as e:
+            status = type(e).__name__
+        latencies.append(time.perf_counter() - scheduled)
+        statuses[status] = statuses.get(status, 0) + 1
+        if status != 200:
+            errors += 1
+
+    start = time.perf_counter()
+    tasks = []
+    for index in range(total):
+        scheduled = start + index / args.rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(index, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    latencies.sort()
+    return {
+        "url": url,
+        "requests": total,
+        "target_rps": args.rps,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(percentile(latencies, 0.99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="JSONL traffic file")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", default="/api/query", help="/api/query or /api/query/stream")
+    parser.add_argument("--rps", type=float, default=10.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of traffic to send")
+    parser.add_argument("--requests", type=int, help="send exactly this many requests instead of --duration")
+    parser.add_argument("--users", type=int, default=50, help="distinct user ids for lines without one")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="cap on concurrent connections")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    latency = report["latency_ms"]
+    print(f"{report['requests']} requests to {report['url']} in {report['elapsed_seconds']}s")
+    print(f"throughput:  {report['throughput_rps']} req/s (target {report['target_rps']})")
+    print(f"error rate:  {report['error_rate']:.2%}  {report['statuses']}")
+    print(f"latency ms:  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    if report["error_rate"] > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
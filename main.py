@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, List, Dict
 import asyncio
 import os
 import uuid
@@ -7,26 +7,60 @@ from datetime import datetime
 import json
 import logging
 import sys 
+import time
 import uvicorn
 
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+if __name__ == "__main__":
+    # `python main.py` hands over to `python -m uvicorn main:app` before building anything:
+    # spawned tool workers re-run the main script, and this one would build the whole app in each
+    os.execv(sys.executable, [sys.executable, "-m", "uvicorn", "main:app", "--host", "0.0.0.0", "--port", "8000",
+                              "--app-dir", os.path.dirname(os.path.abspath(__file__))])
+
+
+from app.startup import startup_phase, mark_ready, get_startup_report
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
+with startup_phase("fastapi"):
+    from fastapi import FastAPI, HTTPException, Request, Header, Query
+    from fastapi.staticfiles import StaticFiles
+    from fastapi.templating import Jinja2Templates
+    from fastapi.responses import HTMLResponse, StreamingResponse, Response
+    from starlette.routing import Match
+    from starlette.background import BackgroundTask
+    from pydantic import BaseModel
 
+with startup_phase("google_adk"):
+    from google.adk.sessions import InMemorySessionService
+    from google.adk.runners import Runner
+    from google.adk.events import Event
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from google.genai import types
 
+with startup_phase("agents"):
+    # Import your root agent
+    from app.agent import root_agent
 
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.genai import types
-# Import your root agent
-from app.agent import root_agent
+with startup_phase("app"):
+    from app.router import (try_fast_path, record_agent_latency, get_router_stats, classify_query,
+                            split_query_parts, is_self_contained)
+    from app.response_cache import response_cache, UNCACHEABLE_AGENTS, normalize_query
+    from app.coalesce import SingleFlight
+    from app.model_tiers import get_model_stats
+    from app.admission import admission, AdmissionRejected, ADMISSION_ENABLED
+    from app.session_store import SessionStore
+    from app.sqlite_sessions import SqliteDatabase, SqliteSessionService, SqliteSessionStore
+    from app.session_compaction import session_turn, get_compaction_stats
+    from app.metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT, AgentHopTimer, QUERY_COALESCING, render_metrics
+    from app.tools.executor import tool_pool, ToolTimeoutError
+    from app.tools.math_tools import evaluate_expressions
+    from app.tools.expression_cache import get_expression_cache_stats
+    from app.tools.graph_cache import (read_graph, is_valid_graph_file, get_graph_cache_stats, get_graph_write_stats,
+                                      MEDIA_TYPES)
+    from app.tools.web_search import search_cache
+    from app.tools.search_extract import get_extract_stats
 ADK_AVAILABLE = True
 
 
@@ -40,8 +74,15 @@ app = FastAPI(title="AI Tutor Multi-Agent System", version="1.0.0")
 templates = Jinja2Templates(directory="templates")
 
 # Session service and runner for Google ADK
+# "memory" keeps sessions in this process; "sqlite" shares them between uvicorn workers
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
 
-session_service = InMemorySessionService()
+if SESSION_BACKEND == "sqlite":
+    session_db = SqliteDatabase()
+    session_service = SqliteSessionService(session_db)
+else:
+    session_db = None
+    session_service = InMemorySessionService()
     # Initialize Runner with required parameters
 runner = Runner(
         agent=root_agent,
@@ -52,9 +93,47 @@ runner = Runner(
 # Global constants for ADK
 APP_NAME = "ai_tutor_app"
 
+# Answer tool-shaped queries locally without the orchestrator round-trips
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Bulk query jobs: per-request concurrency cap and batch size limit
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "8"))
+BATCH_QUERY_MAX_ITEMS = int(os.getenv("BATCH_QUERY_MAX_ITEMS", "500"))
+
+# Largest page of conversation history returned by GET /api/session/{id}
+SESSION_PAGE_MAX_LIMIT = 200
 
-# In-memory storage for sessions (you can replace with Redis/Database)
-sessions_storage = {}
+# Serve repeated questions from the in-process response cache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+
+# Identical context-free queries arriving together (a classroom asking the
+# projected question) share one agent run instead of one each
+QUERY_COALESCING_ENABLED = os.getenv("QUERY_COALESCING_ENABLED", "true").lower() == "true"
+query_flights = SingleFlight()
+
+# Questions spanning several subjects are split and each part answered concurrently
+FANOUT_ENABLED = os.getenv("FANOUT_ENABLED", "true").lower() == "true"
+FANOUT_MAX_PARTS = int(os.getenv("FANOUT_MAX_PARTS", "4"))
+# Newest messages of the conversation each part is given, so parts can build on earlier answers
+FANOUT_HISTORY_MESSAGES = int(os.getenv("FANOUT_HISTORY_MESSAGES", "6"))
+FANOUT_STATS = {"questions": 0, "parts": 0, "part_errors": 0, "declined_busy": 0}
+
+
+def forget_adk_session(session_id: str, record):
+    """Drop the ADK side of a session when the session store evicts it"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    loop.create_task(session_service.delete_session(
+        app_name=APP_NAME, user_id=record.user_id, session_id=session_id
+    ))
+
+# Tutor sessions, bounded by idle TTL and history length (and by count when in memory)
+if session_db is not None:
+    sessions_storage = SqliteSessionStore(session_db, on_evict=forget_adk_session)
+else:
+    sessions_storage = SessionStore(on_evict=forget_adk_session)
 
 class QueryRequest(BaseModel):
     query: str
@@ -67,6 +146,16 @@ class QueryResponse(BaseModel):
     user_id: str
     agent_used: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    user_id: Optional[str] = None
+    concurrency: Optional[int] = None
+
+class BatchEvaluateRequest(BaseModel):
+    expression: Optional[str] = None
+    expressions: List[str] = []
+    variables: Dict[str, List[float]] = {}
+
 class SessionRequest(BaseModel):
     user_id: str
 
@@ -76,71 +165,467 @@ class SessionResponse(BaseModel):
     created_at: str
     message: str
 
-def create_new_session(user_id: str) -> str:
+async def create_new_session(user_id: str) -> str:
     """Create a new session for a user"""
-    session_id = f"session_{uuid.uuid4().hex[:8]}"
-    sessions_storage[session_id] = {
-        "user_id": user_id,
-        "created_at": datetime.now().isoformat(),
-        "conversation_history": [],
-        "context": {}
-    }
-    return session_id
+    return await sessions_storage.create(user_id)
 
-def get_session_data(session_id: str):
+async def get_session_data(session_id: str, touch: bool = True):
     """Get session data"""
-    return sessions_storage.get(session_id)
+    return await sessions_storage.get(session_id, touch=touch)
 
-def add_to_conversation_history(session_id: str, role: str, message: str):
+async def add_to_conversation_history(session_id: str, role: str, message: str):
     """Add message to conversation history"""
-    if session_id in sessions_storage:
-        sessions_storage[session_id]["conversation_history"].append({
-            "role": role,
-            "message": message,
-            "timestamp": datetime.now().isoformat()
-        })
+    await sessions_storage.add_message(session_id, role, message)
 
-async def call_agent_async(query: str, user_id: str, session_id: str) -> str:
-    """Call the agent using proper Google ADK API"""
+async def ensure_adk_session(user_id: str, session_id: str):
+    """Create the ADK session if it doesn't exist yet"""
+    try:
+        await session_service.create_session(
+            app_name=APP_NAME,
+            user_id=user_id,
+            session_id=session_id
+        )
+    except Exception:
+        # Session might already exist
+        pass
+
+async def call_agent_async(query: str, user_id: str, session_id: str) -> tuple:
+    """Call the agent using proper Google ADK API
+    
+    Returns (response_text, agent_name); agent_name is None when no agent produced a final answer.
+    """
     if not ADK_AVAILABLE or not runner or not types:
-        return None
+        return None, None
     
     try:
         # Create session if it doesn't exist in ADK
-        try:
-            session = await session_service.create_session(
-                app_name=APP_NAME,
-                user_id=user_id,
-                session_id=session_id
-            )
-        except Exception:
-            # Session might already exist
-            pass
+        await ensure_adk_session(user_id, session_id)
         
         # Prepare the user's message in ADK format
         content = types.Content(role='user', parts=[types.Part(text=query)])
         
         final_response_text = "Agent did not produce a final response."
+        final_agent = None
+        hops = AgentHopTimer()
         
-        # Use run_async with proper parameters
-        async for event in runner.run_async(
-            user_id=user_id, 
-            session_id=session_id, 
-            new_message=content
-        ):
-            # Check for final response
-            if event.is_final_response():
-                if event.content and event.content.parts:
-                    final_response_text = event.content.parts[0].text
-                elif event.actions and event.actions.escalate:
-                    final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
-                break
+        # Use run_async with proper parameters; the turn keeps the replayed history
+        # within the prompt budget and stops compaction from recreating the session mid-run
+        try:
+            async with session_turn(session_service, APP_NAME, user_id, session_id):
+                async for event in runner.run_async(
+                    user_id=user_id, 
+                    session_id=session_id, 
+                    new_message=content
+                ):
+                    hops.observe(event.author)
+                    # Check for final response
+                    if event.is_final_response():
+                        if event.content and event.content.parts:
+                            final_response_text = event.content.parts[0].text
+                            final_agent = event.author
+                        elif event.actions and event.actions.escalate:
+                            final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
+                        break
+        finally:
+            hops.finish(final_agent)
         
-        return final_response_text
+        return final_response_text, final_agent
         
     except Exception as e:
         logger.error(f"ADK call_agent_async error: {e}")
-        return f"Error processing request: {str(e)}"
+        return f"Error processing request: {str(e)}", None
+
+async def stream_agent_async(query: str, user_id: str, session_id: str):
+    """Stream agent events (partial text, transfers, tool calls) as they arrive"""
+    await ensure_adk_session(user_id, session_id)
+    
+    content = types.Content(role='user', parts=[types.Part(text=query)])
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE)
+    hops = AgentHopTimer()
+    final_agent = None
+    
+    try:
+        async with session_turn(session_service, APP_NAME, user_id, session_id):
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=content,
+                run_config=run_config
+            ):
+                author = event.author or "ai_tutor_orchestrator"
+                hops.observe(event.author)
+                
+                for call in event.get_function_calls():
+                    yield {"type": "tool_call", "agent": author, "tool": call.name, "args": call.args or {}}
+                
+                for result in event.get_function_responses():
+                    yield {"type": "tool_result", "agent": author, "tool": result.name}
+                
+                if event.actions and event.actions.transfer_to_agent:
+                    yield {"type": "transfer", "agent": author, "to_agent": event.actions.transfer_to_agent}
+                
+                if event.content and event.content.parts:
+                    text = "".join(part.text for part in event.content.parts if part.text)
+                    if text and event.partial:
+                        yield {"type": "partial", "agent": author, "text": text}
+                    elif text and event.is_final_response():
+                        final_agent = author
+                        yield {"type": "final", "agent": author, "text": text}
+                        return
+                
+                if event.is_final_response():
+                    if event.actions and event.actions.escalate:
+                        text = f"Agent escalated: {event.error_message or 'No specific message.'}"
+                        yield {"type": "final", "agent": author, "text": text}
+                        return
+    finally:
+        hops.finish(final_agent)
+
+async def stream_agent_timed(query: str, user_id: str, session_id: str, cache_as: Optional[str]):
+    """stream_agent_async, timed for the router stats and cached if cache_as answered it"""
+    start = time.perf_counter()
+    async for event in stream_agent_async(query, user_id, session_id):
+        if cache_as and event["type"] == "final" and event["agent"] == cache_as:
+            response_cache.put(query, cache_as, event["text"])
+        yield event
+    record_agent_latency(time.perf_counter() - start)
+
+async def stream_coalesced(query: str, user_id: str, session_id: str, cache_as: Optional[str]):
+    """stream_agent_timed shared with identical queries already in flight
+    
+    The leader's events are relayed as they arrive. A follower waits for the
+    leader's run and gets its answer as one final event, recorded in the
+    follower's own ADK session for follow-ups.
+    """
+    relay = asyncio.Queue()
+    
+    async def lead() -> tuple:
+        final_text, final_agent, partial_text = None, None, ""
+        try:
+            async for event in stream_agent_timed(query, user_id, session_id, cache_as):
+                relay.put_nowait(event)
+                if event["type"] == "partial":
+                    partial_text += event["text"]
+                elif event["type"] == "final":
+                    final_text, final_agent = event["text"], event["agent"]
+            return final_text or partial_text or None, final_agent
+        finally:
+            relay.put_nowait(None)
+    
+    flight = asyncio.ensure_future(query_flights.run(normalize_query(query), lead))
+    # A follower's lead() never runs, so the flight finishing ends its relay
+    flight.add_done_callback(lambda _: relay.put_nowait(None))
+    try:
+        while True:
+            event = await relay.get()
+            if event is None:
+                break
+            yield event
+        (response_text, final_agent), shared = await flight
+    finally:
+        # Only stops this caller waiting; the shared run carries on for the others
+        flight.cancel()
+    
+    QUERY_COALESCING.labels("follower" if shared else "leader").inc()
+    if shared and response_text:
+        logger.info(f"Coalesced streamed query for session {session_id} with one already in flight")
+        yield {"type": "final", "agent": final_agent or "ai_tutor_orchestrator", "text": response_text}
+        if final_agent:
+            await record_adk_exchange(user_id, session_id, query, response_text, final_agent)
+
+def format_sse(event: dict) -> str:
+    """Format an event dict as a Server-Sent Events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+def admission_key(user_id: Optional[str], session_id: Optional[str], http_request: Request) -> str:
+    """Whose rate limit a request counts against
+    
+    The web client sends "anonymous_user" until a student sets a name, so
+    anonymous callers are told apart by session, or by address before they have one.
+    """
+    if user_id and user_id != "anonymous_user":
+        return user_id
+    if session_id:
+        return f"session:{session_id}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+def admission_refused(key: str, e: AdmissionRejected) -> HTTPException:
+    logger.warning(f"Admission refused for {key}: {e.reason}, retry after {e.retry_after}s")
+    return HTTPException(status_code=e.status, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+async def admit_request(key: str) -> Optional[float]:
+    """Take an admission slot for a query, or fail fast with 429/503 and Retry-After
+    
+    Pass the result to admission_release() when the request is done.
+    """
+    if not ADMISSION_ENABLED:
+        return None
+    try:
+        return await admission.acquire(key)
+    except AdmissionRejected as e:
+        raise admission_refused(key, e)
+
+def admission_release(held_from: Optional[float]):
+    if held_from is not None:
+        admission.release(held_from)
+
+async def resolve_session(request: QueryRequest):
+    """Get or create the session for a query request"""
+    user_id = request.user_id or "anonymous_user"
+    session_id = request.session_id
+    
+    # Create session if not provided
+    if not session_id:
+        session_id = await create_new_session(user_id)
+    
+    # Validate session exists
+    session_data = await get_session_data(session_id)
+    if not session_data:
+        session_id = await create_new_session(user_id)
+        session_data = await get_session_data(session_id)
+    # Validate user_id matches session
+    if session_data.user_id != user_id:
+        raise HTTPException(status_code=400, detail="User ID mismatch with session")
+    
+    return user_id, session_id
+
+async def record_adk_exchange(user_id: str, session_id: str, query: str, response_text: str, agent: str):
+    """Append a question and answer produced outside this session's own run to its ADK session
+
+    Keeps follow-up questions in context after a coalesced run, the fast path
+    or a cache hit answered, as if the session's own run had.
+    """
+    await append_adk_messages(user_id, session_id, [("user", "user", query), (agent, "model", response_text)])
+
+async def append_adk_messages(user_id: str, session_id: str, messages: list):
+    """Append [(author, role, text)] to an ADK session as one invocation"""
+    await ensure_adk_session(user_id, session_id)
+    # A turn of its own, so compaction can't recreate the session between the read and the appends
+    async with session_turn(session_service, APP_NAME, user_id, session_id, compact=False):
+        session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        if session is None:
+            return
+        invocation_id = f"e-{uuid.uuid4()}"
+        for author, role, text in messages:
+            await session_service.append_event(session, Event(
+                author=author, invocation_id=invocation_id,
+                content=types.Content(role=role, parts=[types.Part(text=text)])
+            ))
+
+async def starts_conversation(query: str, session_id: str) -> bool:
+    """Whether query opens its session and stands on its own, so its answer can't depend on history"""
+    if not is_self_contained(query):
+        return False
+    session_data = await get_session_data(session_id, touch=False)
+    return session_data is None or session_data.message_count == 0
+
+async def cache_eligibility(query: str, session_id: str, context_free: Optional[bool] = None) -> tuple:
+    """(specialist, context_free, cacheable) for a query, shared by the plain and streaming endpoints
+    
+    Only a session's opening question that clearly belongs to one specialist is cached;
+    a follow-up ("now graph it") classifies the same but its answer is this student's alone.
+    """
+    specialist = classify_query(query)
+    if context_free is None:
+        context_free = await starts_conversation(query, session_id)
+    cacheable = (RESPONSE_CACHE_ENABLED and specialist is not None and specialist not in UNCACHEABLE_AGENTS
+                 and context_free)
+    return specialist, context_free, cacheable
+
+async def run_agent(query: str, user_id: str, session_id: str, cache_as: Optional[str]) -> tuple:
+    """One runner invocation, timed for the router stats and cached if cache_as answered it"""
+    start = time.perf_counter()
+    response_text, final_agent = await call_agent_async(query, user_id, session_id)
+    record_agent_latency(time.perf_counter() - start)
+    if cache_as and final_agent == cache_as:
+        response_cache.put(query, cache_as, response_text)
+    return response_text, final_agent
+
+async def answer_query(query: str, user_id: str, session_id: str, context_free: Optional[bool] = None) -> tuple:
+    """Answer a query via the fast path, the response cache or the agent runner
+    
+    context_free overrides the check that the query opens its session, for
+    sessions the tutor store doesn't know about (fan-out parts).
+    Returns (response_text, agent_used).
+    """
+    agent_used = "ai_tutor_orchestrator"
+    routed = await try_fast_path(query) if FAST_PATH_ENABLED else None
+    
+    specialist, context_free, cacheable = await cache_eligibility(query, session_id, context_free)
+    cached_text = response_cache.get(query, specialist) if cacheable and not routed else None
+    
+    if routed:
+        # Deterministic fast path: the query maps onto a single tool call
+        agent_used, tool_name, response_text = routed
+        logger.info(f"Fast path answered with {tool_name} for session {session_id}")
+        if ADK_AVAILABLE and runner:
+            # The agents never saw this exchange; give it to them for follow-ups
+            await record_adk_exchange(user_id, session_id, query, response_text, agent_used)
+    elif cached_text is not None:
+        agent_used, response_text = specialist, cached_text
+        logger.info(f"Response cache hit for session {session_id}")
+        if ADK_AVAILABLE and runner:
+            await record_adk_exchange(user_id, session_id, query, response_text, agent_used)
+    # Process query with the root agent using Google ADK Runner
+    elif ADK_AVAILABLE and runner and root_agent:
+        try:
+            cache_as = specialist if cacheable else None
+            if QUERY_COALESCING_ENABLED and context_free:
+                (response_text, final_agent), shared = await query_flights.run(
+                    normalize_query(query), lambda: run_agent(query, user_id, session_id, cache_as)
+                )
+                QUERY_COALESCING.labels("follower" if shared else "leader").inc()
+                if shared and final_agent:
+                    logger.info(f"Coalesced query for session {session_id} with one already in flight")
+                    await record_adk_exchange(user_id, session_id, query, response_text, final_agent)
+            else:
+                response_text, final_agent = await run_agent(query, user_id, session_id, cache_as)
+            if final_agent:
+                agent_used = final_agent
+            if not response_text:
+                response_text = "I apologize, but I couldn't process your request."
+        except Exception as e:
+            logger.error(f"ADK Runner error: {e}")
+            response_text = "I apologize, but I'm currently unable to process your request. Please try again later."
+    else:
+        # Fallback mode - simple response
+        response_text = f"🎓 **AI Tutor Response (Fallback Mode)**\n\nI received your query: '{query}'\n\n⚠️ **Note**: The full multi-agent system requires Google ADK to be properly configured. Currently running in demo mode.\n\n💡 **What I can help with**:\n- Mathematics (algebra, calculus, equations)\n- Physics (mechanics, constants, conversions)\n- Biology (cells, genetics, organisms)\n- Chemistry (elements, reactions, calculations)\n- General educational questions\n\nPlease set up the Google ADK environment for full functionality."
+    
+    return response_text, agent_used
+
+async def answer_fanout(query: str, user_id: str, session_id: str) -> Optional[tuple]:
+    """Answer a multi-subject question by asking each part of it concurrently
+    
+    Each part goes through answer_query in its own throwaway session, seeded
+    with the conversation so far (fast path, response cache, coalescing and
+    the agents all still apply), so the wall time is that of the slowest part
+    rather than a chain of transfers. Every part beyond the first needs an
+    admission slot of its own; when the server is too busy for that, the
+    question takes the normal path. Returns (response_text, agent_used), or
+    None when the question should take the normal path.
+    """
+    parts = split_query_parts(query)
+    subjects = {specialist for specialist, _ in parts if specialist}
+    if len(subjects) < 2 or len(parts) > FANOUT_MAX_PARTS:
+        return None
+    
+    # The caller's slot covers the first part
+    extra_slots = []
+    if ADMISSION_ENABLED:
+        for _ in parts[1:]:
+            held_from = await admission.try_acquire()
+            if held_from is None:
+                for held in extra_slots:
+                    admission_release(held)
+                FANOUT_STATS["declined_busy"] += 1
+                logger.info(f"Not fanning out for session {session_id}: no free admission slots")
+                return None
+            extra_slots.append(held_from)
+    
+    session_data = await get_session_data(session_id, touch=False)
+    history = list(session_data.history)[-FANOUT_HISTORY_MESSAGES:] if session_data else []
+    history = [("user", "user", entry.message) if entry.role == "user"
+               else ("ai_tutor_orchestrator", "model", entry.message) for entry in history]
+    
+    async def answer_part(text: str) -> tuple:
+        part_session = f"fanout_{uuid.uuid4().hex[:12]}"
+        try:
+            if history:
+                await append_adk_messages(user_id, part_session, history)
+            # With history the answer may lean on it, so it mustn't be cached or shared
+            return await answer_query(text, user_id, part_session, context_free=False if history else None)
+        finally:
+            try:
+                await session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=part_session)
+            except Exception:
+                pass
+    
+    logger.info(f"Fanning out {len(parts)} parts for session {session_id}: {[agent for agent, _ in parts]}")
+    try:
+        results = await asyncio.gather(*[answer_part(text) for _, text in parts], return_exceptions=True)
+    finally:
+        for held_from in extra_slots:
+            admission_release(held_from)
+    sections = []
+    for (_, text), result in zip(parts, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Fan-out part failed for session {session_id}: {result}")
+            FANOUT_STATS["part_errors"] += 1
+            answer = "I apologize, but I couldn't answer this part. Please try asking it on its own."
+        else:
+            answer = result[0]
+        sections.append(f"**{text}**\n\n{answer}")
+    response_text = "\n\n---\n\n".join(sections)
+    FANOUT_STATS["questions"] += 1
+    FANOUT_STATS["parts"] += len(parts)
+    
+    # The parts ran in other sessions; give this one the exchange for follow-ups
+    await record_adk_exchange(user_id, session_id, query, response_text, "ai_tutor_orchestrator")
+    return response_text, "ai_tutor_orchestrator"
+
+async def answer_query_or_fanout(query: str, user_id: str, session_id: str) -> tuple:
+    """answer_fanout for multi-subject questions, answer_query for everything else"""
+    if FANOUT_ENABLED and ADK_AVAILABLE and runner:
+        answered = await answer_fanout(query, user_id, session_id)
+        if answered is not None:
+            return answered
+    return await answer_query(query, user_id, session_id)
+
+@app.on_event("startup")
+async def start_tool_pool():
+    # Spawn the tool workers; each imports and warms up sympy/matplotlib in the background
+    tool_pool.start()
+    mark_ready()
+
+@app.on_event("shutdown")
+async def stop_tool_pool():
+    tool_pool.shutdown()
+
+@app.on_event("shutdown")
+async def flush_session_db():
+    # Commit queued session writes before the writer thread dies with the process
+    if session_db is not None:
+        await asyncio.to_thread(session_db.flush)
+
+def route_template(scope) -> str:
+    """Route path pattern for a request, so metrics aren't labelled with session ids"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    route = route_template(request.scope)
+    start = time.perf_counter()
+    in_flight = REQUESTS_IN_FLIGHT.labels(route)
+    in_flight.inc()
+    try:
+        response = await call_next(request)
+    except Exception:
+        in_flight.dec()
+        REQUEST_LATENCY.labels(request.method, route, "500").observe(time.perf_counter() - start)
+        raise
+    
+    async def observed_body(body):
+        # Streaming responses are still running here; stop the clock when the body is done
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(
+                time.perf_counter() - start)
+    
+    response.body_iterator = observed_body(response.body_iterator)
+    return response
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
@@ -148,42 +633,19 @@ async def read_root(request: Request):
 
 
 @app.post("/api/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
+    # Outside the try below so refusals stay 429/503 rather than becoming 500s
+    held_from = await admit_request(admission_key(request.user_id, request.session_id, http_request))
     try:
-        user_id = request.user_id or "anonymous_user"
-        session_id = request.session_id
-        
-        # Create session if not provided
-        if not session_id:
-            session_id = create_new_session(user_id)
-        
-        # Validate session exists
-        session_data = get_session_data(session_id)
-        if not session_data:
-            session_id = create_new_session(user_id)
-            session_data = get_session_data(session_id)
-          # Validate user_id matches session
-        if session_data["user_id"] != user_id:
-            raise HTTPException(status_code=400, detail="User ID mismatch with session")
+        user_id, session_id = await resolve_session(request)
         
         logger.info(f"Processing query for user {user_id}, session {session_id}: {request.query}")
         
-        # Process query with the root agent using Google ADK Runner
-        if ADK_AVAILABLE and runner and root_agent:
-            try:
-                response_text = await call_agent_async(request.query, user_id, session_id)
-                if not response_text:
-                    response_text = "I apologize, but I couldn't process your request."
-            except Exception as e:
-                logger.error(f"ADK Runner error: {e}")
-                response_text = "I apologize, but I'm currently unable to process your request. Please try again later."
-        else:
-            # Fallback mode - simple response
-            response_text = f"🎓 **AI Tutor Response (Fallback Mode)**\n\nI received your query: '{request.query}'\n\n⚠️ **Note**: The full multi-agent system requires Google ADK to be properly configured. Currently running in demo mode.\n\n💡 **What I can help with**:\n- Mathematics (algebra, calculus, equations)\n- Physics (mechanics, constants, conversions)\n- Biology (cells, genetics, organisms)\n- Chemistry (elements, reactions, calculations)\n- General educational questions\n\nPlease set up the Google ADK environment for full functionality."
+        response_text, agent_used = await answer_query_or_fanout(request.query, user_id, session_id)
         
         # Update conversation history
-        add_to_conversation_history(session_id, "user", request.query)
-        add_to_conversation_history(session_id, "assistant", response_text)
+        await add_to_conversation_history(session_id, "user", request.query)
+        await add_to_conversation_history(session_id, "assistant", response_text)
         
         logger.info(f"Response generated for session {session_id}")
         
@@ -191,25 +653,314 @@ async def process_query(request: QueryRequest):
             response=response_text,
             session_id=session_id,
             user_id=user_id,
-            agent_used="ai_tutor_orchestrator"
+            agent_used=agent_used
         )
         
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission_release(held_from)
+
+@app.post("/api/query/stream")
+async def process_query_stream(request: QueryRequest, http_request: Request):
+    """Stream the agent's response as Server-Sent Events"""
+    if not (ADK_AVAILABLE and runner and root_agent):
+        raise HTTPException(status_code=503, detail="Streaming requires Google ADK to be configured")
+    
+    held_from = await admit_request(admission_key(request.user_id, request.session_id, http_request))
+    released = False
+    
+    def release():
+        # The slot is held until the stream ends; whichever of the generator's
+        # cleanup and the response's background task runs first gives it back
+        nonlocal released
+        if not released:
+            released = True
+            admission_release(held_from)
+    
+    try:
+        user_id, session_id = await resolve_session(request)
+    except Exception:
+        release()
+        raise
+    logger.info(f"Streaming query for user {user_id}, session {session_id}: {request.query}")
+    
+    async def event_stream():
+        try:
+            async for message in stream_events():
+                yield message
+        finally:
+            release()
+    
+    async def stream_events():
+        yield format_sse({"type": "session", "session_id": session_id, "user_id": user_id})
+        
+        partial_text = ""
+        final_text = None
+        agent_used = "ai_tutor_orchestrator"
+        routed = await try_fast_path(request.query) if FAST_PATH_ENABLED else None
+        try:
+            # The same caching rules as answer_query, so both endpoints fill and serve one cache
+            specialist, context_free, cacheable = await cache_eligibility(request.query, session_id)
+            fanned_out = None
+            if not routed and FANOUT_ENABLED:
+                fanned_out = await answer_fanout(request.query, user_id, session_id)
+            cached_text = (response_cache.get(request.query, specialist)
+                           if cacheable and not routed and not fanned_out else None)
+            if routed:
+                agent_used, tool_name, final_text = routed
+                yield format_sse({"type": "tool_call", "agent": agent_used, "tool": tool_name, "args": {}})
+                yield format_sse({"type": "final", "agent": agent_used, "text": final_text})
+                await record_adk_exchange(user_id, session_id, request.query, final_text, agent_used)
+            elif fanned_out:
+                # The merged answer is sent as one final event once the slowest part is done
+                final_text, agent_used = fanned_out
+                yield format_sse({"type": "final", "agent": agent_used, "text": final_text})
+            elif cached_text is not None:
+                agent_used, final_text = specialist, cached_text
+                logger.info(f"Response cache hit for streamed query in session {session_id}")
+                yield format_sse({"type": "final", "agent": agent_used, "text": final_text})
+                await record_adk_exchange(user_id, session_id, request.query, final_text, agent_used)
+            else:
+                cache_as = specialist if cacheable else None
+                # The same opening questions from a classroom share one agent run, as in answer_query
+                if QUERY_COALESCING_ENABLED and context_free:
+                    agent_events = stream_coalesced(request.query, user_id, session_id, cache_as)
+                else:
+                    agent_events = stream_agent_timed(request.query, user_id, session_id, cache_as)
+                async for event in agent_events:
+                    agent_used = event.get("agent", agent_used)
+                    if event["type"] == "partial":
+                        partial_text += event["text"]
+                    elif event["type"] == "final":
+                        final_text = event["text"]
+                    yield format_sse(event)
+        except Exception as e:
+            logger.error(f"ADK streaming error: {e}")
+            final_text = f"Error processing request: {str(e)}"
+            yield format_sse({"type": "error", "message": final_text})
+        finally:
+            # Record the exchange even if the client disconnected mid-stream
+            response_text = final_text or partial_text or "I apologize, but I couldn't process your request."
+            await add_to_conversation_history(session_id, "user", request.query)
+            await add_to_conversation_history(session_id, "assistant", response_text)
+            session_data = await get_session_data(session_id, touch=False)
+            logger.info(f"Stream finished for session {session_id}")
+        
+        yield format_sse({
+            "type": "done",
+            "response": response_text,
+            "session_id": session_id,
+            "user_id": user_id,
+            "agent_used": agent_used,
+            # Lets the client resume incremental history loading after this exchange
+            "history_cursor": session_data.message_count if session_data else None
+        })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
+@app.get("/api/router/stats")
+async def router_stats():
+    """Fast-path router hit rate and estimated latency saved, and multi-subject fan-out counts"""
+    return {**get_router_stats(), "fanout": FANOUT_STATS}
+
+@app.get("/api/admin/cache")
+async def cache_stats():
+    """Response cache statistics"""
+    return response_cache.get_stats()
+
+@app.delete("/api/admin/cache")
+async def clear_cache():
+    """Drop every cached response"""
+    response_cache.clear()
+    return {"message": "Response cache cleared successfully"}
+
+@app.get("/api/admin/models")
+async def model_stats():
+    """Configured model per agent and the observed latency/error health of each model"""
+    return get_model_stats()
+
+@app.get("/api/admin/admission")
+async def admission_stats():
+    """Admission slots in use, queue depth and rejection counters"""
+    return admission.get_stats()
+
+@app.get("/api/admin/coalescing")
+async def coalescing_stats():
+    """How many agent-run queries led an execution and how many shared one in flight"""
+    return query_flights.get_stats()
+
+@app.get("/api/admin/startup")
+async def startup_stats():
+    """Import time per startup phase, which lazy modules are loaded, and tool worker warm-up times"""
+    return {**get_startup_report(), "tool_worker_warmup_seconds": tool_pool.warmup}
+
+@app.get("/api/admin/tool-pool")
+async def tool_pool_stats():
+    """Tool worker pool call, timeout and recycle counters"""
+    return tool_pool.get_stats()
+
+# Graph ids are content hashes, so a given URL always serves the same bytes
+GRAPH_CACHE_CONTROL = "public, max-age=86400"
+
+@app.get("/graphs/{graph_file}")
+async def get_graph_image(graph_file: str, if_none_match: Optional[str] = Header(None)):
+    """Serve a graph rendered by the create_graph tool"""
+    graph_id, _, image_format = graph_file.partition(".")
+    if not is_valid_graph_file(graph_id, image_format):
+        raise HTTPException(status_code=404, detail="Graph not found")
+    
+    etag = f'"{graph_id}"'
+    headers = {"ETag": etag, "Cache-Control": GRAPH_CACHE_CONTROL}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    image = read_graph(graph_id, image_format)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Graph not found")
+    return Response(content=image, media_type=MEDIA_TYPES[image_format], headers=headers)
+
+@app.get("/api/admin/search-cache")
+async def search_cache_stats():
+    """Web search cache hit, coalescing and backend call counters, and how much extraction trimmed"""
+    return {**search_cache.get_stats(), "extraction": get_extract_stats()}
+
+@app.delete("/api/admin/search-cache")
+async def clear_search_cache():
+    """Drop every cached search result"""
+    search_cache.clear()
+    return {"message": "Search cache cleared successfully"}
+
+@app.get("/api/admin/graph-cache")
+async def graph_cache_stats():
+    """Graph cache hit counters of this process, with writes and prunes summed over it and the tool workers"""
+    stats = get_graph_cache_stats()
+    for worker_stats in await tool_pool.broadcast(get_graph_write_stats):
+        for name, value in worker_stats.items():
+            stats[name] += value
+    return stats
+
+@app.get("/api/admin/expression-cache")
+async def expression_cache_stats():
+    """sympy parse/solve/lambdify cache counters for this process and each tool worker"""
+    return {
+        "server": get_expression_cache_stats(),
+        "workers": await tool_pool.broadcast(get_expression_cache_stats)
+    }
+
+@app.post("/api/batch/evaluate")
+async def batch_evaluate(request: BatchEvaluateRequest):
+    """Evaluate expressions over arrays of variable values in one vectorized pass"""
+    expressions = ([request.expression] if request.expression else []) + request.expressions
+    try:
+        start = time.perf_counter()
+        result = await tool_pool.run(evaluate_expressions, expressions, request.variables)
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ToolTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/api/query/batch")
+async def process_query_batch(request: BatchQueryRequest, http_request: Request):
+    """Run many independent queries concurrently, streaming NDJSON results as they finish
+    
+    The batch spends one of the user's rate tokens up front; each item then
+    holds an admission slot while it runs, like a single query would.
+    """
+    if len(request.queries) > BATCH_QUERY_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_QUERY_MAX_ITEMS} queries per batch")
+    
+    user_id = request.user_id or "anonymous_user"
+    if ADMISSION_ENABLED:
+        key = admission_key(request.user_id, None, http_request)
+        try:
+            admission.limit_rate(key)
+        except AdmissionRejected as e:
+            raise admission_refused(key, e)
+    concurrency = max(1, min(request.concurrency or BATCH_QUERY_CONCURRENCY, BATCH_QUERY_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    logger.info(f"Processing batch of {len(request.queries)} queries for user {user_id} (concurrency {concurrency})")
+    
+    async def run_item(index: int, query: str) -> dict:
+        async with semaphore:
+            # Each item gets its own throwaway ADK session so answers stay independent
+            session_id = f"batch_{uuid.uuid4().hex[:12]}"
+            start = time.perf_counter()
+            held_from = None
+            try:
+                if ADMISSION_ENABLED:
+                    held_from = await admission.acquire(None)
+                response_text, agent_used = await answer_query(query, user_id, session_id)
+                error = None
+            except Exception as e:
+                # Includes AdmissionRejected: a busy server fails the item, not the batch
+                response_text, agent_used, error = None, None, str(e)
+            finally:
+                admission_release(held_from)
+                try:
+                    await session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+                except Exception:
+                    pass
+            return {
+                "index": index,
+                "query": query,
+                "response": response_text,
+                "agent_used": agent_used,
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                "error": error
+            }
+    
+    async def result_stream():
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(run_item(index, query)) for index, query in enumerate(request.queries)]
+        errors = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                errors += item["error"] is not None
+                yield json.dumps(item) + "\n"
+        finally:
+            # Stop outstanding work if the client goes away
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({
+            "done": True,
+            "count": len(tasks),
+            "errors": errors,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+        }) + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@app.get("/api/admin/sessions")
+async def session_store_stats():
+    """Session store size, estimated memory, eviction and compaction counters"""
+    stats = await sessions_storage.get_stats()
+    stats["compaction"] = get_compaction_stats()
+    if session_db is not None:
+        stats["adk_sessions"] = session_service.get_stats()
+    return stats
 
 @app.post("/api/session/new", response_model=SessionResponse)
 async def create_session_endpoint(request: SessionRequest):
     try:
-        session_id = create_new_session(request.user_id)
-        session_data = get_session_data(session_id)
+        session_id = await create_new_session(request.user_id)
+        session_data = await get_session_data(session_id)
         
         logger.info(f"New session created: {session_id} for user: {request.user_id}")
         
         return SessionResponse(
             session_id=session_id,
             user_id=request.user_id,
-            created_at=session_data["created_at"],
+            created_at=datetime.fromtimestamp(session_data.created_at).isoformat(),
             message="New session created successfully"
         )
         
@@ -219,19 +970,26 @@ async def create_session_endpoint(request: SessionRequest):
 
 
 @app.get("/api/session/{session_id}")
-async def get_session(session_id: str):
-    session_data = get_session_data(session_id)
+async def get_session(session_id: str, limit: Optional[int] = None, before: Optional[int] = Query(None, ge=0),
+                      since: Optional[int] = Query(None, ge=0), metadata_only: bool = False):
+    """Session data; with limit/before/since, one page of history addressed by message sequence number"""
+    session_data = await get_session_data(session_id)
     if not session_data:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return session_data
+    if metadata_only:
+        return session_data.metadata()
+    if limit is None and before is None and since is None:
+        return session_data.to_dict()
+    if limit is not None and not 1 <= limit <= SESSION_PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SESSION_PAGE_MAX_LIMIT}")
+    return session_data.page(since=since, before=before, limit=limit)
 
 
 @app.delete("/api/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear a specific session"""
-    if session_id in sessions_storage:
-        del sessions_storage[session_id]
+    if await sessions_storage.delete(session_id):
         return {"message": "Session cleared successfully"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -249,8 +1007,8 @@ async def get_agents():
             "math": {
                 "id": "math_agent",
                 "name": "Math Tutor Agent",
-                "capabilities": ["calculations", "equation solving", "graphing"],
-                "tools": ["calculate_expression", "solve_equation", "create_graph"]
+                "capabilities": ["calculations", "equation solving", "graphing", "batch evaluation"],
+                "tools": ["calculate_expression", "solve_equation", "create_graph", "evaluate_batch"]
             },
             "physics": {
                 "id": "physics_agent", 
@@ -278,7 +1036,3 @@ async def get_agents():
             }
         }
     }
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
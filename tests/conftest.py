@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Run the app offline: scripted model and canned search results, quick enough for tests
+os.environ.setdefault("FAKE_MODEL", "true")
+os.environ.setdefault("FAKE_MODEL_LATENCY_MS", "50")
+os.environ.setdefault("FAKE_MODEL_JITTER_MS", "0")
+os.environ.setdefault("WEB_SEARCH_BACKEND", "fake")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_tools import build_cases
+
+
+def test_benchmark_corpora_exercise_the_tools_not_their_error_paths():
+    failures = {case.name: case.failures() for case in build_cases(max_dna=1_000)}
+    assert {name: inputs for name, inputs in failures.items() if inputs} == {}
@@ -0,0 +1,46 @@
+import asyncio
+
+from google.adk.models import LlmRequest
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.agent import root_agent
+from app.fake_model import latest_query
+
+
+def user_content(*texts) -> types.Content:
+    return types.Content(role="user", parts=[types.Part(text=text) for text in texts])
+
+
+def test_latest_query_skips_replayed_context():
+    # What a specialist is sent after the orchestrator transfers to it
+    request = LlmRequest(contents=[
+        user_content("convert 5 meters to feet"),
+        user_content("For context:", "[ai_tutor_orchestrator] called tool `transfer_to_agent` with parameters: "
+                                     "{'agent_name': 'physics_agent'}"),
+        user_content("For context:", "[ai_tutor_orchestrator] `transfer_to_agent` tool returned result: "
+                                     "{'result': None}"),
+    ])
+    assert latest_query(request) == "convert 5 meters to feet"
+
+
+def test_latest_query_skips_context_sharing_a_part():
+    request = LlmRequest(contents=[user_content("what is 2 + 2"),
+                                   user_content("For context: [math_agent] said something")])
+    assert latest_query(request) == "what is 2 + 2"
+
+
+def test_routed_specialist_calls_its_tool():
+    async def run() -> list:
+        sessions = InMemorySessionService()
+        runner = Runner(agent=root_agent, app_name="fake_model_test", session_service=sessions)
+        await sessions.create_session(app_name="fake_model_test", user_id="student", session_id="s")
+        message = user_content("convert 5 meters to feet")
+        return [event async for event in runner.run_async(user_id="student", session_id="s", new_message=message)]
+
+    calls = [(event.author, call.name, call.args) for event in asyncio.run(run())
+             for call in event.get_function_calls()]
+
+    assert ("ai_tutor_orchestrator", "transfer_to_agent", {"agent_name": "physics_agent"}) in calls
+    assert ("physics_agent", "convert_units", {"value": 5.0, "from_unit": "m", "to_unit": "ft"}) in calls
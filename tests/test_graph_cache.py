@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+import httpx
+
+import main
+from app.tools import graph_cache
+from app.tools.math_tools import render_graph_cached
+
+
+def test_equivalent_spellings_share_one_graph(monkeypatch, tmp_path):
+    monkeypatch.setattr(graph_cache, "GRAPH_CACHE_DIR", str(tmp_path))
+
+    first = render_graph_cached("x^2 - 4*x + 4", "-5,5", "svg")
+    second = render_graph_cached("4 - 4*x + x**2", "-5,5", "svg")
+
+    assert first == second
+    assert os.listdir(tmp_path) == [f"{first}.svg"]
+
+    async def fetch(graph_id: str):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(f"/graphs/{graph_id}.svg")
+
+    responses = [asyncio.run(fetch(graph_id)) for graph_id in (first, second)]
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].headers["ETag"] == responses[1].headers["ETag"] == f'"{first}"'
@@ -0,0 +1,24 @@
+import json
+import threading
+from logging.handlers import RotatingFileHandler
+
+from app.tools import instrumentation
+
+
+def test_records_are_written_off_the_calling_thread(monkeypatch, tmp_path):
+    monkeypatch.setattr(instrumentation, "TOOL_LOG_DIR", str(tmp_path))
+    monkeypatch.setattr(instrumentation, "_record_logger", None)
+    monkeypatch.setattr(instrumentation, "_record_listener", None)
+    writers = []
+    emit = RotatingFileHandler.emit
+    monkeypatch.setattr(RotatingFileHandler, "emit",
+                        lambda handler, record: (writers.append(threading.get_ident()), emit(handler, record)))
+
+    instrumentation.write_record("convert_units", 0.002, None, (5.0, "m", "ft"), {}, "16.4 ft", False, awaited=True)
+    instrumentation.close_record_log()
+
+    assert writers and threading.get_ident() not in writers
+    (log_file,) = tmp_path.iterdir()
+    (record,) = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert record["tool"] == "convert_units"
+    assert record["awaited"] is True
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import httpx
+
+import main
+
+
+def parse_sse(body: str) -> list:
+    events = []
+    for message in body.strip().split("\n\n"):
+        data = [line[len("data: "):] for line in message.splitlines() if line.startswith("data: ")]
+        if data:
+            events.append(json.loads("".join(data)))
+    return events
+
+
+async def stream_query(client: httpx.AsyncClient, query: str, user_id: str) -> list:
+    response = await client.post("/api/query/stream", json={"query": query, "user_id": user_id})
+    assert response.status_code == 200
+    return parse_sse(response.text)
+
+
+def run_queries(*requests) -> list:
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[stream_query(client, query, user_id) for query, user_id in requests])
+    return asyncio.run(scenario())
+
+
+def test_identical_streamed_questions_share_one_run():
+    query = "Explain how photosynthesis works in green plants"
+    before = dict(main.query_flights.stats)
+
+    first, second = run_queries((query, "student_a"), (query, "student_b"))
+
+    assert main.query_flights.stats["leaders"] == before["leaders"] + 1
+    assert main.query_flights.stats["coalesced"] == before["coalesced"] + 1
+    finals = [[event for event in events if event["type"] == "final"] for events in (first, second)]
+    assert len(finals[0]) == len(finals[1]) == 1
+    assert finals[0][0]["text"] == finals[1][0]["text"]
+    assert first[-1]["type"] == second[-1]["type"] == "done"
+
+
+def test_streamed_answer_is_cached_for_the_next_student():
+    query = "Describe the structure of a plant cell"
+    before = dict(main.response_cache.stats)
+
+    (first,) = run_queries((query, "student_c"))
+    (second,) = run_queries((query, "student_d"))
+
+    # The first student's question ran the agents, and the specialist's answer was stored
+    assert "error" not in [event["type"] for event in first]
+    assert any(event["type"] == "transfer" for event in first)
+    (answer,) = [event for event in first if event["type"] == "final"]
+    assert answer["agent"] == "biology_agent"
+    assert main.response_cache.stats["stores"] == before["stores"] + 1
+
+    # The second was answered from the cache without an agent run
+    assert main.response_cache.stats["hits"] == before["hits"] + 1
+    assert [event["type"] for event in second] == ["session", "final", "done"]
+    assert second[1]["agent"] == "biology_agent"
+    assert second[1]["text"] == answer["text"]
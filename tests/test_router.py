@@ -0,0 +1,20 @@
+from app.router import split_query_parts
+
+
+def test_split_keeps_dependent_clause_with_its_question():
+    parts = split_query_parts(
+        "compute the kinetic energy and convert it to calories, and what's the molar mass of glucose")
+    assert parts == [
+        ("physics_agent", "compute the kinetic energy and convert it to calories"),
+        ("chemistry_agent", "what's the molar mass of glucose"),
+    ]
+
+
+def test_split_leaves_single_cross_subject_question_whole():
+    query = "Explain photosynthesis and the chemical reaction involved"
+    assert split_query_parts(query) == [("biology_agent", query)]
+
+
+def test_split_needs_a_standalone_opening_clause():
+    query = "convert it to calories and what's the molar mass of glucose"
+    assert len(split_query_parts(query)) == 1
@@ -0,0 +1,18 @@
+import asyncio
+
+import httpx
+
+import main
+
+
+def test_negative_cursors_are_rejected():
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            created = await client.post("/api/session/new", json={"user_id": "student"})
+            session_id = created.json()["session_id"]
+            return [await client.get(f"/api/session/{session_id}", params={name: -1, "limit": 5})
+                    for name in ("before", "since")]
+
+    for response in asyncio.run(scenario()):
+        assert response.status_code == 422
@@ -0,0 +1,103 @@
+import asyncio
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app import session_compaction
+from app.session_compaction import session_turn
+from app.sqlite_sessions import SqliteDatabase, SqliteSessionService
+
+APP = "ai_tutor_app"
+
+
+def message(author: str, text: str) -> Event:
+    role = "user" if author == "user" else "model"
+    return Event(author=author, invocation_id="e-test", content=types.Content(role=role, parts=[types.Part(text=text)]))
+
+
+async def long_session(service):
+    session = await service.create_session(app_name=APP, user_id="u", session_id="s")
+    for turn in range(10):
+        await service.append_event(session, message("user", f"question {turn} " + "x" * 200))
+        await service.append_event(session, message("math_agent", f"answer {turn} " + "y" * 200))
+    return session
+
+
+def test_no_compaction_while_another_turn_runs(monkeypatch):
+    monkeypatch.setattr(session_compaction, "SESSION_COMPACT_TRIGGER_TOKENS", 100)
+    monkeypatch.setattr(session_compaction, "SESSION_KEEP_TURNS", 1)
+
+    async def scenario():
+        service = InMemorySessionService()
+        await long_session(service)
+        async with session_turn(service, APP, "u", "s", compact=False):
+            running = await service.get_session(app_name=APP, user_id="u", session_id="s")
+            async with session_turn(service, APP, "u", "s"):
+                pass
+            # The running turn's session was not deleted under it
+            await service.append_event(running, message("math_agent", "still here"))
+        stored = await service.get_session(app_name=APP, user_id="u", session_id="s")
+        assert len(stored.events) == 21
+
+        # Once nothing is running, the next turn compacts
+        async with session_turn(service, APP, "u", "s"):
+            pass
+        stored = await service.get_session(app_name=APP, user_id="u", session_id="s")
+        assert len(stored.events) < 21
+
+    before = session_compaction.COMPACTION_STATS["skipped_busy"]
+    asyncio.run(scenario())
+    assert session_compaction.COMPACTION_STATS["skipped_busy"] == before + 1
+    assert not session_compaction.ACTIVE_TURNS
+
+
+def test_no_compaction_while_another_worker_runs_a_turn(monkeypatch, tmp_path):
+    monkeypatch.setattr(session_compaction, "SESSION_COMPACT_TRIGGER_TOKENS", 100)
+    monkeypatch.setattr(session_compaction, "SESSION_KEEP_TURNS", 1)
+    path = str(tmp_path / "sessions.db")
+
+    async def scenario():
+        # Two workers sharing one database
+        worker_a = SqliteSessionService(SqliteDatabase(path))
+        worker_b = SqliteSessionService(SqliteDatabase(path))
+        await long_session(worker_a)
+
+        turn = await worker_b.acquire_lease(APP, "u", "s", "turn")
+        async with session_turn(worker_a, APP, "u", "s"):
+            pass
+        stored = await worker_a.get_session(app_name=APP, user_id="u", session_id="s")
+        assert len(stored.events) == 20
+        worker_b.release_lease(turn)
+        worker_b.db.flush()
+
+        async with session_turn(worker_a, APP, "u", "s"):
+            pass
+        stored = await worker_b.get_session(app_name=APP, user_id="u", session_id="s")
+        assert len(stored.events) < 20
+
+    asyncio.run(scenario())
+
+
+def test_turn_waits_for_another_workers_compaction(tmp_path):
+    path = str(tmp_path / "sessions.db")
+
+    async def scenario():
+        worker_a = SqliteSessionService(SqliteDatabase(path))
+        worker_b = SqliteSessionService(SqliteDatabase(path))
+        await worker_a.create_session(app_name=APP, user_id="u", session_id="s")
+
+        compaction = await worker_b.acquire_lease(APP, "u", "s", "compaction")
+        assert await worker_a.acquire_lease(APP, "u", "s", "compaction") is None
+
+        async def turn():
+            async with session_turn(worker_a, APP, "u", "s", compact=False):
+                return True
+
+        started = asyncio.ensure_future(turn())
+        await asyncio.sleep(0.2)
+        assert not started.done()
+        worker_b.release_lease(compaction)
+        assert await asyncio.wait_for(started, 5)
+
+    asyncio.run(scenario())
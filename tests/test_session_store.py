@@ -0,0 +1,22 @@
+from app.session_store import HistoryEntry, SessionRecord
+
+
+def record_with(messages: int, max_history: int) -> SessionRecord:
+    record = SessionRecord("student", max_history=max_history)
+    for seq in range(messages):
+        record.history.append(HistoryEntry("user", f"message {seq}", 0.0))
+        record.message_count += 1
+    return record
+
+
+def test_page_before_trimmed_history_is_empty():
+    record = record_with(messages=10, max_history=5)
+    page = record.page(before=2, limit=3)
+    assert page["conversation_history"] == []
+    assert page["cursors"]["before"] is None
+
+
+def test_page_before_returns_older_messages():
+    record = record_with(messages=10, max_history=5)
+    page = record.page(before=8, limit=2)
+    assert [entry["seq"] for entry in page["conversation_history"]] == [6, 7]